@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Offline benchmark of map_bizterm and map_bizterm_allatonce against the local mock server (wkc_mock_server.py).
+# It reports throughput, requests per column and p50/p99 request latency for synthetic catalogs:
+#
+#   python wkc_benchmark.py --columns 10 100 1000 10000 --latency 0.01 --workers 1 8
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from wkcapi_v1 import MapTermsJob
+from wkc_mock_server import MockGlossary, MockWatsonDataAPI
+
+
+class BenchmarkClient(MapTermsJob):
+    # records the client side latency of every api call
+    def __init__(self, *args, **kwargs):
+        self.latencies = []
+        super().__init__(*args, **kwargs)
+
+    def request(self, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().request(method, path, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter()-start)
+
+
+def run_benchmark(columns, mode='map_bizterm', max_workers=1, latency=0.0, jitter=0.0, error_rate=0.0, columns_per_asset=40, categories=10, terms=100, seed=0, capacity=None, **options):
+    assets = math.ceil(columns/columns_per_asset)
+    columns_per_asset = min(columns, columns_per_asset)
+    columns = assets*columns_per_asset
+    glossary = MockGlossary(categories, terms, catalogs=1, assets=assets, columns=columns_per_asset, seed=seed)
+    with tempfile.TemporaryDirectory() as tmpdir, MockWatsonDataAPI(glossary, latency=latency, jitter=jitter, error_rate=error_rate, seed=seed, capacity=capacity) as server:
+        map_bizterm_csv = os.path.join(tmpdir, 'map-bizterm-glossary.csv')
+        glossary.write_mapping_csv(map_bizterm_csv)
+        wkc = BenchmarkClient(server.url, 'admin', 'password', None, pool_size=max(10, max_workers), quiet=True)
+        server.reset_stats()
+        wkc.latencies.clear()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = getattr(wkc, mode)(map_bizterm_csv, max_workers=max_workers, **options)
+        elapsed_time = time.perf_counter()-start
+        wkc.close()
+        latencies = pd.Series(wkc.latencies)
+        mapped_columns = sum(len(each) for each in glossary.attributes.values())
+        return {
+            "Mode": mode,
+            "Workers": max_workers,
+            "Columns": columns,
+            "Assets": assets,
+            "Seconds": round(elapsed_time, 3),
+            "ColumnsPerSec": round(columns/elapsed_time, 1),
+            "Requests": sum(server.requests.values()),
+            "RequestsPerColumn": round(sum(server.requests.values())/columns, 3),
+            "Throttled": sum(server.throttled.values()),
+            "P50ms": round(float(latencies.quantile(0.5))*1000, 2) if len(latencies) else None,
+            "P99ms": round(float(latencies.quantile(0.99))*1000, 2) if len(latencies) else None,
+            "Failed": int((result.Status=="failed").sum()),
+            "Mapped": mapped_columns,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mapping entry points of wkcapi_v1 against the local mock server")
+    parser.add_argument('--columns', type=int, nargs='+', default=[10, 100, 1000, 10000], help="total columns to map (ex. 10 100 1000 10000 100000)")
+    parser.add_argument('--modes', nargs='+', default=['map_bizterm', 'map_bizterm_allatonce'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1])
+    parser.add_argument('--columns-per-asset', type=int, default=40)
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--terms', type=int, default=100, help="business terms per category")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added by the mock server to every request")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--capacity', type=int, help="concurrent requests the mock server serves before answering 429")
+    parser.add_argument('--output', help="also write the results to this csv file")
+    args = parser.parse_args()
+
+    results = []
+    for columns in args.columns:
+        for mode in args.modes:
+            for max_workers in args.workers:
+                results.append(run_benchmark(
+                    columns, mode, max_workers, args.latency, args.jitter, args.error_rate,
+                    args.columns_per_asset, args.categories, args.terms, capacity=args.capacity
+                ))
+                print(results[-1])
+    results = pd.DataFrame(results)
+    print('='*100)
+    print(results.to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
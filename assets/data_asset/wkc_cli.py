@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# Command line entry point of wkcapi_v1 for scheduled jobs. The cluster and the credentials are given with
+# --host/--info-json or --host/--username (password from WKC_PASSWORD, or asked), or with WKC_HOST/WKC_USERNAME:
+#
+#   python wkc_cli.py --host https://cpd.example.com --info-json info.json map map-bizterm-glossary.csv --workers 8
+#   python wkc_cli.py --host https://cpd.example.com --cache wkc-metadata-cache.db dry-run map-bizterm-glossary.csv
+#   python wkc_cli.py --host https://cpd.example.com --username admin export column-info.csv --catalogs "Catalog A"
+#   python wkc_cli.py --host https://cpd.example.com --username admin --workers 8 snapshot before.jsonl --catalogs "Catalog A"
+#   python wkc_cli.py --host https://cpd.example.com --username admin --workers 8 reset --csv map-bizterm-glossary.csv
+
+import argparse
+import os
+import sys
+from getpass import getpass
+
+from wkcapi_v1 import DEFAULT_BATCH_SIZE, DEFAULT_POOL_SIZE, MapTermsJSON, MapTermsJob, WatsonKnowledgeCatalog
+
+
+class OfflineCatalog(WatsonKnowledgeCatalog):
+    # client without any token, for the dry-run: plans are estimated from the cache only
+    def get_token(self):
+        return None
+
+
+def create_client(args):
+    options = dict(pool_size=max(DEFAULT_POOL_SIZE, args.workers), cache=args.cache, token_cache=args.token_cache, quiet=args.quiet)
+    if args.info_json:
+        return MapTermsJSON(args.host, args.info_json, **options)
+    if not args.host or not args.username:
+        sys.exit("--host and --username (or --info-json) are required")
+    password = os.environ.get('WKC_PASSWORD') or getpass("Password: ")
+    return MapTermsJob(args.host, args.username, password, None, **options)
+
+
+def map_command(args):
+    with create_client(args) as wkc:
+        mode = wkc.map_bizterm_allatonce if args.allatonce else wkc.map_bizterm
+        result = mode(
+            args.csv, max_workers=args.workers, incremental=args.incremental, remove_missing=args.remove_missing,
+            batch_size=args.batch_size, chunksize=args.chunksize, presorted=args.presorted, journal=args.journal, resume=args.resume
+        )
+    if args.result:
+        result.to_csv(args.result, index=False)
+    return int((result.Status=="failed").any())
+
+
+def dry_run_command(args):
+    if args.cache and not args.host:
+        # the cache is kept per cluster host: without it nothing would be read from the cache
+        sys.exit("--host (or WKC_HOST) is required with --cache")
+    wkc = OfflineCatalog(args.host or "offline", cache=args.cache, quiet=True)
+    mode = "map_bizterm_allatonce" if args.allatonce else "map_bizterm"
+    plan = wkc.plan_mapping(args.csv, mode, args.workers, args.incremental, args.batch_size, args.chunksize, args.latencies)
+    plan.print()
+    wkc.close()
+    return 0
+
+
+def export_command(args):
+    if args.csv is None and not args.catalogs:
+        sys.exit("give a mapping csv (--csv) or catalog names (--catalogs)")
+    with create_client(args) as wkc:
+        result = wkc.export_column_info(args.output, args.csv, args.catalogs, args.workers, chunksize=args.chunksize)
+    return int((result.Status=="failed").any())
+
+
+def bulk_command(args):
+    if args.csv is None and not args.catalogs:
+        sys.exit("give a mapping csv (--csv) or catalog names (--catalogs)")
+    with create_client(args) as wkc:
+        if args.command=="snapshot":
+            result = wkc.snapshot_attributes(args.snapshot, map_bizterm_csv=args.csv, catalogs=args.catalogs, max_workers=args.workers)
+        else:
+            bulk = {"create": wkc.bulk_create_attribute, "delete": wkc.bulk_delete_attribute, "reset": wkc.bulk_reset_attribute}[args.command]
+            result = bulk(map_bizterm_csv=args.csv, catalogs=args.catalogs, max_workers=args.workers)
+    return int((result.Status=="failed").any())
+
+
+def restore_command(args):
+    with create_client(args) as wkc:
+        result = wkc.restore_attributes(args.snapshot, max_workers=args.workers)
+    return int((result.Status=="failed").any())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Map business terms to the columns of catalog assets with the Watson Data API")
+    parser.add_argument('--host', default=os.environ.get('WKC_HOST'), help="cpd cluster url (default: WKC_HOST)")
+    parser.add_argument('--info-json', help="json file with the username and password")
+    parser.add_argument('--username', default=os.environ.get('WKC_USERNAME'), help="default: WKC_USERNAME, with the password in WKC_PASSWORD")
+    parser.add_argument('--cache', help="sqlite file keeping the resolved ids between runs")
+    parser.add_argument('--token-cache', help="json file sharing the token between runs and processes")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--chunksize', type=int, help="stream the csv file in chunks of this many rows")
+    parser.add_argument('--quiet', action='store_true', help="no progress message per row and asset")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def mapping_arguments(command):
+        command.add_argument('csv', help="mapping csv file (Catalog, DataAsset, ColumnHeader, BusinessTerm, Category)")
+        command.add_argument('--allatonce', action='store_true', help="create the column_info attribute of each asset in one request")
+        command.add_argument('--incremental', action='store_true', help="only send the columns differing from the current attribute")
+        command.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    command = commands.add_parser('map', help="map the business terms of a mapping csv file")
+    mapping_arguments(command)
+    command.add_argument('--remove-missing', action='store_true', help="with --incremental, remove the terms of columns missing in the csv")
+    command.add_argument('--presorted', action='store_true', help="with --chunksize, the csv is sorted by Catalog and DataAsset")
+    command.add_argument('--journal', help="checkpoint journal of the finished assets and columns")
+    command.add_argument('--resume', action='store_true', help="skip the work recorded in --journal")
+    command.add_argument('--result', help="write the result of each asset to this csv file")
+    command.set_defaults(run=map_command)
+
+    command = commands.add_parser('dry-run', help="validate a mapping csv file and estimate its requests and runtime, without any api call")
+    mapping_arguments(command)
+    command.add_argument('--latencies', help="metrics json file of a previous run (JSONMetricsExporter) for the runtime estimate")
+    command.set_defaults(run=dry_run_command)
+
+    command = commands.add_parser('export', help="export the column_info attributes to a csv or parquet file")
+    command.add_argument('output', help="csv file, or parquet file for a name ending with .parquet")
+    command.add_argument('--csv', help="export the assets of this mapping csv file")
+    command.add_argument('--catalogs', nargs='+', help="export every asset of these catalogs")
+    command.set_defaults(run=export_command)
+
+    for name, help_text in (
+        ("create", "create an empty column_info attribute in the assets"),
+        ("delete", "delete the column_info attribute of the assets"),
+        ("reset", "delete the column_info attribute of the assets and create it again empty"),
+        ("snapshot", "save the column_info attributes of the assets into a local file"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        if name=="snapshot":
+            command.add_argument('snapshot', help="json lines file")
+        command.add_argument('--csv', help="the assets of this mapping csv file")
+        command.add_argument('--catalogs', nargs='+', help="every asset of these catalogs")
+        command.set_defaults(run=bulk_command)
+
+    command = commands.add_parser('restore', help="put back the column_info attributes saved by snapshot")
+    command.add_argument('snapshot')
+    command.set_defaults(run=restore_command)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
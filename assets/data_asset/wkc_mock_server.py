@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# Local stand-in for the Watson Data API endpoints used by wkcapi_v1, with a synthetic glossary and catalogs.
+# It answers over plain http, so it can be used as the cpd_cluster_host of any wkcapi_v1 class:
+#
+#   python wkc_mock_server.py --port 8080 --latency 0.05 --error-rate 0.01 --catalogs 2 --assets 50 --columns 40
+#   wkc = MapTermsJob('http://127.0.0.1:8080', 'admin', 'password', None)
+
+import argparse
+import base64
+import csv
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def get_field(document, field):
+    # value of a dotted field (ex. 'categories.primary_category_id') of a document, None if missing
+    for key in field.split('.'):
+        if not isinstance(document, dict) or key not in document:
+            return None
+        document = document[key]
+    return document
+
+
+def project(document, fields):
+    # keep only the given dotted fields of a document, as the _source of an elasticsearch query
+    if not fields:
+        return document
+    projected = dict()
+    for field in fields:
+        value = get_field(document, field)
+        if value is None:
+            continue
+        target = projected
+        keys = field.split('.')
+        for key in keys[:-1]:
+            target = target.setdefault(key, dict())
+        target[keys[-1]] = value
+    return projected
+
+
+def match_query(document, query):
+    # minimal evaluation of the elasticsearch query dsl used by wkcapi_v1 (bool, term, terms, match)
+    if not query:
+        return True
+    if "bool" in query:
+        clauses = query["bool"]
+        def as_list(clause):
+            if clause is None:
+                return []
+            return clause if isinstance(clause, list) else [clause]
+        for each in as_list(clauses.get("must"))+as_list(clauses.get("filter")):
+            if not match_query(document, each):
+                return False
+        for each in as_list(clauses.get("must_not")):
+            if match_query(document, each):
+                return False
+        should = as_list(clauses.get("should"))
+        if should and not any(match_query(document, each) for each in should):
+            return False
+        return True
+    if "term" in query:
+        field, value = next(iter(query["term"].items()))
+        return get_field(document, field)==value
+    if "terms" in query:
+        field, values = next(iter(query["terms"].items()))
+        return get_field(document, field) in values
+    if "match" in query:
+        field, text = next(iter(query["match"].items()))
+        value = get_field(document, field)
+        if value is None:
+            return False
+        tokens = [each.strip() for each in re.split(r'>>|\s+', str(text)) if each.strip()]
+        return value==text or value in tokens
+    raise ValueError(f"unsupported query: {query}")
+
+
+class MockGlossary:
+    # synthetic governance data: a category tree with business terms, and catalogs of assets with columns
+    def __init__(self, categories=10, terms=100, catalogs=1, assets=10, columns=10, seed=0):
+        self.random = random.Random(seed)
+        self.artifacts = []
+        self.terms = []
+        root_id = "category-root"
+        self.artifacts.append({
+            "artifact_id": root_id,
+            "metadata": {"name": "Mock Glossary", "artifact_type": "category"},
+            "categories": {}
+        })
+        for i in range(categories):
+            category_id = f"category-{i}"
+            category_name = f"SubCategory{i}"
+            self.artifacts.append({
+                "artifact_id": category_id,
+                "metadata": {"name": category_name, "artifact_type": "category"},
+                "categories": {"primary_category_id": root_id, "primary_category_name": "Mock Glossary"}
+            })
+            for j in range(terms):
+                term = {
+                    "artifact_id": f"term-{i}-{j}",
+                    "metadata": {"name": f"Term {i}-{j}", "artifact_type": "glossary_term", "description": f"mock business term {j} of {category_name}"},
+                    "categories": {"primary_category_id": category_id, "primary_category_name": category_name},
+                    "entity": {"artifacts": {"artifact_id": f"term-{i}-{j}"}}
+                }
+                self.artifacts.append(term)
+                self.terms.append((term["metadata"]["name"], f"Mock Glossary >> {category_name}"))
+        self.catalogs = dict()
+        self.assets = dict()
+        for i in range(catalogs):
+            catalog_name = f"Mock Catalog {i}"
+            catalog_id = f"catalog-{i}"
+            self.catalogs[catalog_id] = catalog_name
+            for j in range(assets):
+                asset_id = f"asset-{i}-{j}"
+                self.assets[asset_id] = {
+                    "catalog_id": catalog_id,
+                    "name": f"MOCK_ASSET_{j}",
+                    "columns": [f"col_{k}" for k in range(columns)]
+                }
+        self.attributes = dict()
+
+    def write_mapping_csv(self, path):
+        # mapping csv (same form as map-bizterm-glossary.csv) assigning a random term to every column
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Catalog', 'DataAsset', 'ColumnHeader', 'BusinessTerm', 'Category'])
+            for asset in self.assets.values():
+                for column in asset["columns"]:
+                    term, category_path = self.random.choice(self.terms)
+                    writer.writerow([self.catalogs[asset["catalog_id"]], asset["name"], column, term, category_path])
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, so nagle + delayed ack would add ~40ms to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body=None, headers=None):
+        data = b"" if status==204 else json.dumps(body if body is not None else {}, ensure_ascii=False).encode('utf-8')
+        headers = dict(headers or {})
+        # large bodies are compressed for the clients accepting gzip, as the cluster's gateway does
+        if len(data)>1024 and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def handle_request(self, method):
+        server = self.server
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = self.read_json()
+        endpoint = server.endpoint(url.path)
+        with server.lock:
+            server.requests[endpoint] += 1
+            server.inflight += 1
+            throttled = server.capacity is not None and server.inflight > server.capacity
+            if throttled:
+                server.throttled[endpoint] += 1
+        try:
+            if throttled:
+                return self.send_json(429, {"errors": [{"message": "too many requests"}]}, {"Retry-After": str(server.retry_after)})
+            self.handle_admitted_request(method, server, url, params, body, endpoint)
+        finally:
+            with server.lock:
+                server.inflight -= 1
+
+    def handle_admitted_request(self, method, server, url, params, body, endpoint):
+        if server.latency or server.jitter:
+            time.sleep(server.latency+server.random.uniform(0, server.jitter))
+        if endpoint!="authorize" and server.random.random() < server.error_rate:
+            with server.lock:
+                server.errors[endpoint] += 1
+            return self.send_json(server.error_status, {"errors": [{"message": "mock error"}]})
+        if endpoint!="authorize" and not server.valid_token(self.headers.get('Authorization')):
+            return self.send_json(401, {"errors": [{"message": "invalid token"}]})
+        status, response = server.dispatch(method, url.path, params, body)
+        self.send_json(status, response)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PATCH(self):
+        self.handle_request("PATCH")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+
+class MockWatsonDataAPI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, glossary=None, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500, seed=0, capacity=None, retry_after=1, token_lifetime=None):
+        super().__init__((host, port), MockHandler)
+        self.glossary = glossary if glossary is not None else MockGlossary(seed=seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.token = "mock-token"
+        # with token_lifetime every authorize issues a new jwt, which is rejected with 401 once it has expired
+        self.token_lifetime = token_lifetime
+        self.tokens = dict()
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.throttled = Counter()
+        # concurrent requests above capacity are answered with 429 and Retry-After
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests.clear()
+            self.errors.clear()
+            self.throttled.clear()
+
+    def issue_token(self):
+        if self.token_lifetime is None:
+            return self.token
+        with self.lock:
+            claims = {"sub": "admin", "jti": len(self.tokens), "exp": time.time()+self.token_lifetime}
+            encode = lambda part: base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip('=')
+            token = ".".join([encode({"alg": "none", "typ": "JWT"}), encode(claims), "mock"])
+            self.tokens[token] = claims["exp"]
+        return token
+
+    def valid_token(self, authorization):
+        token = (authorization or "")[len("Bearer "):]
+        if self.token_lifetime is None:
+            return token==self.token
+        return time.time() < self.tokens.get(token, 0)
+
+    def endpoint(self, path):
+        if path.startswith("/icp4d-api/v1/authorize"):
+            return "authorize"
+        if path.startswith("/v2/catalogs"):
+            return "catalogs"
+        if path.startswith("/v3/search"):
+            return "search"
+        if path.startswith("/v2/asset_types/asset/search"):
+            return "asset_search"
+        if path.startswith("/v2/assets"):
+            return "assets"
+        return "unknown"
+
+    def dispatch(self, method, path, params, body):
+        glossary = self.glossary
+        if path=="/icp4d-api/v1/authorize" and method=="POST":
+            return 200, {"token": self.issue_token()}
+        if path=="/v2/catalogs" and method=="GET":
+            catalogs = [{"metadata": {"guid": catalog_id}, "entity": {"name": catalog_name}} for catalog_id, catalog_name in glossary.catalogs.items()]
+            return 200, {"catalogs": catalogs}
+        if path=="/v3/search" and method=="POST":
+            body = body or {}
+            rows = [each for each in glossary.artifacts if match_query(each, body.get("query"))]
+            total = len(rows)
+            # sort on one field, and search_after on its value, as elasticsearch does for deep paging
+            for sort in body.get("sort", [])[:1]:
+                field, order = next(iter(sort.items())) if isinstance(sort, dict) else (sort, "asc")
+                order = order.get("order", "asc") if isinstance(order, dict) else order
+                rows = sorted(rows, key=lambda each: get_field(each, field), reverse=order=="desc")
+                if body.get("search_after"):
+                    after = body["search_after"][0]
+                    rows = [each for each in rows if (get_field(each, field) < after if order=="desc" else get_field(each, field) > after)]
+            start, size = body.get("from", 0), body.get("size", 10)
+            if start+size > 10000:
+                return 400, {"errors": [{"message": "Result window is too large, from + size must be less than or equal to: [10000]"}]}
+            return 200, {"size": total, "rows": [project(each, body.get("_source")) for each in rows[start:start+size]]}
+        if path=="/v2/asset_types/asset/search" and method=="POST":
+            return self.search_assets(params.get("catalog_id"), body or {})
+        match = re.fullmatch(r"/v2/assets/([^/]+)(/attributes(/column_info)?)?", path)
+        if match is None or match.group(1) not in glossary.assets:
+            return 404, {"errors": [{"message": f"{path} not found"}]}
+        asset_id = match.group(1)
+        asset = glossary.assets[asset_id]
+        if match.group(2) is None and method=="GET":
+            return 200, {"metadata": {"asset_id": asset_id, "name": asset["name"], "catalog_id": asset["catalog_id"]}, "entity": {}}
+        with self.lock:
+            if match.group(3) is None and method=="POST":
+                if asset_id in glossary.attributes:
+                    return 409, {"errors": [{"message": "attribute column_info already exists"}]}
+                glossary.attributes[asset_id] = dict((body or {}).get("entity", {}))
+                return 201, {"column_info": glossary.attributes[asset_id]}
+            if match.group(3) is None or asset_id not in glossary.attributes:
+                return 404, {"errors": [{"message": "attribute column_info not found"}]}
+            column_info = glossary.attributes[asset_id]
+            if method=="GET":
+                return 200, {"column_info": column_info}
+            if method=="DELETE":
+                del glossary.attributes[asset_id]
+                return 204, {}
+            if method=="PATCH":
+                for operation in body:
+                    column_name = operation["path"][1:].replace('~1', '/').replace('~0', '~')
+                    if operation["op"]=="remove":
+                        if column_name not in column_info:
+                            return 400, {"errors": [{"message": f"{operation['path']} does not exist"}]}
+                        del column_info[column_name]
+                    elif operation["op"] in ("add", "replace"):
+                        column_info[column_name] = operation["value"]
+                    else:
+                        return 400, {"errors": [{"message": f"unsupported op {operation['op']}"}]}
+                return 200, {"column_info": column_info}
+        return 405, {"errors": [{"message": f"{method} {path} is not allowed"}]}
+
+    def search_assets(self, catalog_id, body):
+        names = set()
+        for each in body.get("query", "").split(" OR "):
+            field, _, value = each.strip().partition(":")
+            if field=="asset.name":
+                names.add(value.strip('"').replace('\\"', '"'))
+        results = [
+            {"metadata": {"asset_id": asset_id, "name": asset["name"], "catalog_id": catalog_id}}
+            for asset_id, asset in self.glossary.assets.items()
+            if asset["catalog_id"]==catalog_id and (not names or asset["name"] in names)
+        ]
+        limit = body.get("limit", 200)
+        start = int(body.get("bookmark") or 0)
+        response = {"total_rows": len(results), "results": results[start:start+limit]}
+        if start+limit < len(results):
+            response["next"] = {**body, "bookmark": str(start+limit)}
+        return 200, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Watson Data API endpoints used by wkcapi_v1")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="random seconds added on top of the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="ratio of requests answered with --error-status")
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--capacity', type=int, help="concurrent requests served before answering 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds of the 429 answers")
+    parser.add_argument('--token-lifetime', type=float, help="seconds before an issued token expires (default: never)")
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--terms', type=int, default=100, help="business terms per category")
+    parser.add_argument('--catalogs', type=int, default=1)
+    parser.add_argument('--assets', type=int, default=10, help="assets per catalog")
+    parser.add_argument('--columns', type=int, default=10, help="columns per asset")
+    parser.add_argument('--mapping-csv', help="write a mapping csv of the synthetic catalogs to this path")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    glossary = MockGlossary(args.categories, args.terms, args.catalogs, args.assets, args.columns, args.seed)
+    if args.mapping_csv:
+        glossary.write_mapping_csv(args.mapping_csv)
+    server = MockWatsonDataAPI(glossary, args.host, args.port, args.latency, args.jitter, args.error_rate, args.error_status, args.seed, args.capacity, args.retry_after, args.token_lifetime)
+    print(f"mock Watson Data API is listening on {server.url} (user/password: any)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
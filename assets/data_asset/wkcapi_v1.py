@@ -6,25 +6,521 @@ __version__ = "1.1"
 __email__ = "kiyeon.jeon@ibm.com"
 
 
+# pandas is imported by the functions working on csv files and result tables only,
+# so that importing this module (ex. for the command line) stays fast
 import requests
 from requests.adapters import HTTPAdapter, Retry
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+from urllib3.exceptions import InsecureRequestWarning
 import json
-import pandas as pd
-from pandas import json_normalize
+import re
+import base64
+import contextlib
+import sqlite3
 import time
+import math
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from collections import deque
+import os
+import tempfile
+import zlib
+import unicodedata
+from array import array
 import logging
+import threading
+import warnings
+from urllib.parse import urlparse
 from abc import *
-import logging
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
 logger = logging.getLogger('API Error Log')
 logger.setLevel(logging.ERROR)
-handler = logging.FileHandler('error.log')
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+metrics_logger = logging.getLogger('API Metrics')
+metrics_logger.setLevel(logging.INFO)
+
+
+def setup_logging(path=None):
+    # attach the error log file to the module logger, once, when the first class using it is created.
+    # the path is taken from WKC_ERROR_LOG (default error.log), and an empty WKC_ERROR_LOG keeps it off the disk.
+    path = os.environ.get('WKC_ERROR_LOG', 'error.log') if path is None else path
+    if not path or any(isinstance(handler, logging.FileHandler) for handler in logger.handlers):
+        return
+    handler = logging.FileHandler(path, delay=True)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
 
 DEFAULT_TIMEOUT = 0.5
+DEFAULT_POOL_SIZE = 10
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_BATCH_SIZE = 100
+# asset names per OR-combined asset search of resolve_asset_ids
+DEFAULT_ASSET_CHUNK_SIZE = 50
+DEFAULT_PARTITIONS = 16
+DEFAULT_CHUNKSIZE = 100000
+DEFAULT_TOKEN_REFRESH_MARGIN = 60
+DEFAULT_NEGATIVE_TTL = 300
+MAPPING_COLUMNS = ['Catalog', 'DataAsset', 'ColumnHeader', 'BusinessTerm', 'Category']
+EXPORT_COLUMNS = MAPPING_COLUMNS+['CatalogId', 'AssetId', 'TermId']
+# upper bounds (seconds) of the request latency histogram
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf')]
+DEFAULT_RETRY = {"total": 10, "backoff_factor": 0.5, "status_forcelist": [429, 500, 503, 504]}
+# answers of a throttling server: the request was not processed and can be sent again after Retry-After
+THROTTLE_STATUS = (429, 503)
+# times a throttled request is sent again, after the shared pause of the FlowController
+DEFAULT_THROTTLE_RETRIES = 10
+# timeout and retry policy per endpoint, keyed by the url path prefix of the endpoint.
+# the longest matching prefix wins, and missing keys fall back to the defaults above.
+DEFAULT_ENDPOINT_POLICY = {
+    "/icp4d-api/v1/authorize": {"timeout": DEFAULT_TIMEOUT},
+    "/v2/catalogs": {"timeout": DEFAULT_TIMEOUT},
+    "/v3/search": {"timeout": 10},
+    "/v2/asset_types/asset/search": {"timeout": 10},
+    "/v2/assets": {"timeout": 15, "retry": {"total": 15}},
+}
+# time to live (seconds) of each metadata namespace in the on-disk cache. None never expires.
+DEFAULT_CACHE_TTL = {
+    "catalog2id": 7*24*3600,
+    "category2id": 24*3600,
+    "categorypath2biztermdict": 3600,
+    "asset2id": 3600,
+    # number of business terms per category path, only used by the dry-run estimate of the term searches
+    "categorypath2termcount": 7*24*3600,
+}
+# seconds per api call used by the dry-run estimate when no latency has been recorded for an endpoint family
+DEFAULT_PLAN_LATENCY = {
+    "catalog_lookup": 0.3,
+    "category_search": 0.5,
+    "term_search": 1.0,
+    "asset_search": 0.5,
+    "attribute_read": 0.3,
+    "attribute_write": 0.5,
+}
+
+
+def normalize_name(name):
+    # unicode NFC, single spaces and case folding, so that '차주 일련번호', '차주  일련번호' and decomposed hangul match
+    return " ".join(unicodedata.normalize('NFC', str(name)).split()).casefold()
+
+
+def name_bigrams(key):
+    padded = f" {key} "
+    return set(padded[idx:idx+2] for idx in range(len(padded)-1))
+
+
+class GlossaryIndex:
+    # hash index of names (ex. business terms or catalogs) -> ids on their exact and normalized forms, and an
+    # inverted index of the character bigrams of the normalized names to suggest the closest names on a miss
+    def __init__(self, name2id):
+        self.source = name2id
+        self.name2id = dict(name2id)
+        self.names = list(self.name2id.keys())
+        self.keys = [normalize_name(name) for name in self.names]
+        self.normalized = dict()
+        self.sizes = array('I')
+        self.postings = dict()
+        for idx, key in enumerate(self.keys):
+            self.normalized.setdefault(key, self.names[idx])
+            bigrams = name_bigrams(key)
+            self.sizes.append(len(bigrams))
+            for bigram in bigrams:
+                self.postings.setdefault(bigram, array('I')).append(idx)
+
+    def canonical(self, name):
+        # the indexed name matching a given name exactly or after normalization, None if there is none
+        if name in self.name2id:
+            return name
+        return self.normalized.get(normalize_name(name))
+
+    def lookup(self, name):
+        return self.name2id.get(self.canonical(name))
+
+    def suggest(self, name, limit=5):
+        # names ranked by the dice similarity of their bigrams, with a bonus when one is a prefix of the other
+        key = normalize_name(name)
+        bigrams = name_bigrams(key)
+        shared = dict()
+        for bigram in bigrams:
+            for idx in self.postings.get(bigram, ()):
+                shared[idx] = shared.get(idx, 0)+1
+        scores = []
+        for idx, count in shared.items():
+            score = 2*count/(len(bigrams)+self.sizes[idx])
+            if self.keys[idx].startswith(key) or key.startswith(self.keys[idx]):
+                score += 0.5
+            scores.append((-score, self.names[idx]))
+        return [name for _, name in sorted(scores)[:limit]]
+
+
+def json_pointer(column_name):
+    # escape a column name as a json pointer token (RFC 6901)
+    return column_name.replace('~', '~0').replace('/', '~1')
+
+
+def column_terms_operation(op, column_name, bizterm=None, bizterm_id=None):
+    # json patch operation on one column of the column_info attribute
+    operation = {"op": op, "path": "/"+json_pointer(column_name)}
+    if op!="remove":
+        operation["value"] = {
+            "column_terms":[
+                {
+                    "term_display_name":bizterm,
+                    "term_id":bizterm_id
+                }
+            ]
+        }
+    return operation
+
+
+def read_mapping_csv(map_bizterm_csv, chunksize):
+    import pandas as pd
+    return pd.read_csv(map_bizterm_csv, chunksize=chunksize, usecols=MAPPING_COLUMNS, dtype=str)
+
+
+def drop_blank_keys(chunk):
+    # rows without a Catalog or a DataAsset belong to no asset: they are reported and left out before grouping or hashing
+    blank = chunk.Catalog.isna() | chunk.DataAsset.isna()
+    if blank.any():
+        print(f"skipping {int(blank.sum())} row(s) without Catalog or DataAsset")
+    return chunk[~blank]
+
+
+def stream_sorted_groups(map_bizterm_csv, chunksize):
+    # yield the (Catalog, DataAsset) groups of a csv sorted by asset; the last group of a chunk is carried over to the next one
+    import pandas as pd
+    seen = set()
+    pending = None
+    for chunk in map(drop_blank_keys, read_mapping_csv(map_bizterm_csv, chunksize)):
+        if len(chunk)==0:
+            continue
+        if pending is not None:
+            chunk = pd.concat([pending, chunk])
+        # runs of consecutive rows of one asset: an asset met again in a later run is out of order
+        runs = ((chunk.Catalog!=chunk.Catalog.shift()) | (chunk.DataAsset!=chunk.DataAsset.shift())).cumsum()
+        is_last = runs==runs.iloc[-1]
+        pending = chunk[is_last]
+        last = (pending.Catalog.iloc[0], pending.DataAsset.iloc[0])
+        for _, rows in chunk[~is_last].groupby(runs[~is_last], sort=True):
+            key = (rows.Catalog.iloc[0], rows.DataAsset.iloc[0])
+            if key in seen:
+                raise ValueError(f"{map_bizterm_csv} is not sorted by (Catalog, DataAsset): {key} appears twice")
+            seen.add(key)
+            yield key, rows
+    if pending is not None and len(pending)>0:
+        if last in seen:
+            raise ValueError(f"{map_bizterm_csv} is not sorted by (Catalog, DataAsset): {last} appears twice")
+        yield last, pending
+
+
+def shard_of(chunk, shards, by='asset'):
+    # stable shard number of each row, from a crc32 hash of its (Catalog, DataAsset) or of its Catalog only
+    keys = chunk.Catalog if by=='catalog' else chunk.Catalog.str.cat(chunk.DataAsset, sep='\x00')
+    return keys.map(lambda key: zlib.crc32(key.encode('utf-8')) % shards)
+
+
+def stream_partitioned_groups(map_bizterm_csv, chunksize, partitions=DEFAULT_PARTITIONS):
+    # split an unsorted csv into partitions on disk by a hash of (Catalog, DataAsset),
+    # then group one partition at a time, so that only 1/partitions of the file is in memory
+    import pandas as pd
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = [os.path.join(tmpdir, f"partition-{idx}.csv") for idx in range(partitions)]
+        for chunk in map(drop_blank_keys, read_mapping_csv(map_bizterm_csv, chunksize)):
+            for idx, rows in chunk.groupby(shard_of(chunk, partitions)):
+                rows.to_csv(paths[idx], mode='a', header=not os.path.exists(paths[idx]), index=False)
+        for path in paths:
+            if os.path.exists(path):
+                yield from pd.read_csv(path, dtype=str).groupby(['Catalog','DataAsset'], sort=False)
+
+
+def endpoint_family(method, path):
+    # metrics label of an api call, when the caller does not give a more specific one (ex. category_search)
+    if path.startswith('/icp4d-api/v1/authorize'):
+        return "authorize"
+    if path.startswith('/v2/catalogs'):
+        return "catalog_lookup"
+    if path.startswith('/v3/search'):
+        return "search"
+    if path.startswith('/v2/asset_types/asset/search'):
+        return "asset_search"
+    if path.startswith('/v2/assets') and '/attributes' in path:
+        return "attribute_read" if method=="GET" else "attribute_write"
+    if path.startswith('/v2/assets'):
+        return "asset_info"
+    return "other"
+
+
+class RequestMetrics:
+    # thread safe counters of the api calls per endpoint family, and hit/miss ratios of the metadata lookups
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = dict()
+            self.cache = dict()
+
+    def observe(self, endpoint, latency, status=None, retries=0, sent=0, received=0, throttled=False):
+        with self.lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                "requests": 0, "errors": 0, "retries": 0, "throttled": 0, "bytes_sent": 0, "bytes_received": 0,
+                "latency_sum": 0.0, "latency_buckets": [0]*len(LATENCY_BUCKETS), "status": dict()
+            })
+            stats["requests"] += 1
+            stats["retries"] += retries
+            stats["throttled"] += int(throttled)
+            stats["bytes_sent"] += sent
+            stats["bytes_received"] += received
+            stats["latency_sum"] += latency
+            stats["status"][str(status)] = stats["status"].get(str(status), 0)+1
+            if status is None or status>=400:
+                stats["errors"] += 1
+            for idx, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats["latency_buckets"][idx] += 1
+                    break
+
+    def lookup(self, namespace, hit):
+        with self.lock:
+            stats = self.cache.setdefault(namespace, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def quantile(self, buckets, q):
+        # upper bound of the histogram bucket holding the q quantile
+        count = sum(buckets)
+        if count==0:
+            return None
+        seen = 0
+        for bound, each in zip(LATENCY_BUCKETS, buckets):
+            seen += each
+            if seen >= q*count:
+                return bound
+
+    def summary(self):
+        with self.lock:
+            endpoints = {
+                endpoint: {
+                    **{key: value for key, value in stats.items() if key not in ("latency_buckets", "status")},
+                    "status": dict(stats["status"]),
+                    "latency_avg": stats["latency_sum"]/stats["requests"],
+                    "latency_p50": self.quantile(stats["latency_buckets"], 0.5),
+                    "latency_p99": self.quantile(stats["latency_buckets"], 0.99),
+                    "latency_histogram": dict(zip([str(bound) for bound in LATENCY_BUCKETS], stats["latency_buckets"])),
+                }
+                for endpoint, stats in self.endpoints.items()
+            }
+            cache = {
+                namespace: {**stats, "hit_ratio": stats["hits"]/max(stats["hits"]+stats["misses"], 1)}
+                for namespace, stats in self.cache.items()
+            }
+        return {"endpoints": endpoints, "cache": cache}
+
+    def prometheus(self):
+        # metrics in the prometheus text exposition format
+        lines = []
+        with self.lock:
+            for name, key, help_text in (
+                ("wkc_requests_total", "requests", "api calls"),
+                ("wkc_request_errors_total", "errors", "api calls failed or answered with an error status"),
+                ("wkc_request_retries_total", "retries", "retries done by the http adapter"),
+                ("wkc_request_throttled_total", "throttled", "api calls throttled by the server (429/503)"),
+                ("wkc_request_bytes_sent_total", "bytes_sent", "request body bytes"),
+                ("wkc_request_bytes_received_total", "bytes_received", "response body bytes"),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f'{name}{{endpoint="{endpoint}"}} {stats[key]}' for endpoint, stats in self.endpoints.items()]
+            lines += ["# HELP wkc_request_latency_seconds latency of the api calls", "# TYPE wkc_request_latency_seconds histogram"]
+            for endpoint, stats in self.endpoints.items():
+                cumulative = 0
+                for bound, each in zip(LATENCY_BUCKETS, stats["latency_buckets"]):
+                    cumulative += each
+                    le = "+Inf" if bound==float('inf') else str(bound)
+                    lines.append(f'wkc_request_latency_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+                lines.append(f'wkc_request_latency_seconds_sum{{endpoint="{endpoint}"}} {stats["latency_sum"]}')
+                lines.append(f'wkc_request_latency_seconds_count{{endpoint="{endpoint}"}} {stats["requests"]}')
+            lines += ["# HELP wkc_metadata_lookups_total metadata lookups served from memory (hit) or from the api (miss)", "# TYPE wkc_metadata_lookups_total counter"]
+            for namespace, stats in self.cache.items():
+                lines.append(f'wkc_metadata_lookups_total{{namespace="{namespace}",result="hit"}} {stats["hits"]}')
+                lines.append(f'wkc_metadata_lookups_total{{namespace="{namespace}",result="miss"}} {stats["misses"]}')
+        return "\n".join(lines)+"\n"
+
+
+class JSONMetricsExporter:
+    def __init__(self, path='wkc-metrics.json'):
+        self.path = path
+
+    def export(self, metrics):
+        with open(self.path, 'w') as f:
+            json.dump(metrics.summary(), f, indent=4)
+
+
+class PrometheusMetricsExporter:
+    # text file for the node exporter textfile collector or a pushgateway
+    def __init__(self, path='wkc-metrics.prom'):
+        self.path = path
+
+    def export(self, metrics):
+        with open(self.path, 'w') as f:
+            f.write(metrics.prometheus())
+
+
+class LogMetricsExporter:
+    # one structured (json) log record per endpoint family and per metadata namespace
+    def __init__(self, logger=metrics_logger, level=logging.INFO):
+        self.logger = logger
+        self.level = level
+        # the module metrics logger writes to stderr unless the application has configured a handler for it
+        if logger is metrics_logger and not logger.hasHandlers():
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+            logger.addHandler(handler)
+
+    def export(self, metrics):
+        summary = metrics.summary()
+        for endpoint, stats in summary["endpoints"].items():
+            self.logger.log(self.level, json.dumps({"endpoint": endpoint, **stats}))
+        for namespace, stats in summary["cache"].items():
+            self.logger.log(self.level, json.dumps({"namespace": namespace, **stats}))
+
+
+def parse_retry_after(value):
+    # seconds to wait from a Retry-After header (delay in seconds or http date), None if missing or invalid
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp()-time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def json_items(r, prefix, fields=None):
+    # items of the json array at prefix (ex. 'rows.item') of a response sent with stream=True. with ijson installed
+    # they are parsed incrementally from the (decompressed) socket stream, without holding the body or its decoded
+    # text; otherwise the body bytes are parsed at once. the top level scalars of the body (ex. the total 'size'
+    # of a search) are put into fields, if given, once the items have been read.
+    try:
+        r.raise_for_status()
+        if ijson is not None:
+            r.raw.decode_content = True
+            if fields is None:
+                yield from ijson.items(r.raw, prefix, use_float=True)
+                return
+            builder, depth = None, 0
+            for path, event, value in ijson.parse(r.raw, use_float=True):
+                if builder is not None or (path==prefix and event in ('start_map', 'start_array')):
+                    builder = builder or ijson.ObjectBuilder()
+                    builder.event(event, value)
+                    depth += {'start_map': 1, 'start_array': 1, 'end_map': -1, 'end_array': -1}.get(event, 0)
+                    if depth==0:
+                        yield builder.value
+                        builder = None
+                elif path==prefix:
+                    yield value
+                elif '.' not in path and event in ('string', 'number', 'boolean', 'null') and path:
+                    fields[path] = value
+            return
+        document = json.loads(r.content)
+        if fields is not None and isinstance(document, dict):
+            fields.update((key, value) for key, value in document.items() if not isinstance(value, (dict, list)))
+        for key in prefix.split('.')[:-1]:
+            document = document.get(key) or {}
+        yield from document or []
+    finally:
+        r.close()
+
+
+def jwt_expiry(token):
+    # expiry (epoch seconds) in the payload of a jwt bearer token, None if it is not a jwt or has no exp claim
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload+'='*(-len(payload)%4)))
+        return float(claims['exp'])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class ThrottleRetry(Retry):
+    # throttled answers (429/503) are not retried inside the adapter: they are returned at once, so that
+    # WatsonKnowledgeCatalog.send pauses every call through the FlowController on the first one and sends the
+    # request again itself (for every method, as a throttled request was not processed).
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code in THROTTLE_STATUS:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class FlowController:
+    # client side flow control shared by every call of a WatsonKnowledgeCatalog instance.
+    # an optional token bucket caps the request rate, and the number of concurrent calls is tuned with AIMD:
+    # additive increase while calls succeed under target_latency, multiplicative decrease (at most once per cooldown)
+    # on throttling, server errors, connection errors or slow calls. A throttled answer pauses every call for its
+    # Retry-After delay, or for throttle_pause seconds if it has none.
+    def __init__(self, rate=None, burst=None, max_concurrency=DEFAULT_POOL_SIZE, min_concurrency=1, target_latency=5.0, decrease=0.5, cooldown=1.0, min_rate=0.1, throttle_pause=0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self.tokens = self.burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.target_latency = target_latency
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.inflight = 0
+        self.throttle_pause = throttle_pause
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.updated = time.monotonic()
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    self.condition.wait(self.paused_until-now)
+                    continue
+                if self.inflight >= int(self.limit):
+                    self.condition.wait()
+                    continue
+                if self.rate is None:
+                    break
+                self.tokens = min(self.burst, self.tokens+(now-self.updated)*self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                self.condition.wait((1-self.tokens)/self.rate)
+            self.inflight += 1
+
+    def release(self, latency, status=None, throttled=False, retry_after=None):
+        with self.condition:
+            self.inflight -= 1
+            now = time.monotonic()
+            if status in THROTTLE_STATUS:
+                self.paused_until = max(self.paused_until, now+(retry_after or self.throttle_pause))
+            if throttled or status is None or status in THROTTLE_STATUS or status>=500 or latency>self.target_latency:
+                if now-self.last_decrease >= self.cooldown:
+                    self.limit = max(self.min_concurrency, self.limit*self.decrease)
+                    if self.rate is not None:
+                        self.rate = max(self.min_rate, self.rate*self.decrease)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.max_concurrency, self.limit+1/max(self.limit, 1))
+                if self.rate is not None:
+                    self.rate = min(self.max_rate, self.rate+self.max_rate/100)
+            self.condition.notify_all()
 
 
 class TimeoutHTTPAdapter(HTTPAdapter):
@@ -41,61 +537,578 @@ class TimeoutHTTPAdapter(HTTPAdapter):
         return super().send(request, **kwargs)
 
 
+class MetadataCache:
+    # sqlite backed cache of the resolved ids in WatsonKnowledgeCatalog.metadata, keyed by cluster host.
+    # every call opens its own connection, so one cache can be shared by threads and processes.
+    def __init__(self, path='wkc-metadata-cache.db', ttl=None):
+        self.path = path
+        self.ttl = dict(DEFAULT_CACHE_TTL)
+        if ttl is not None:
+            self.ttl.update(ttl)
+        with self.connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "host TEXT, namespace TEXT, key TEXT, value TEXT, stored_at REAL, "
+                "PRIMARY KEY (host, namespace, key))"
+            )
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, host):
+        metadata = dict()
+        now = time.time()
+        conn = self.connect()
+        try:
+            rows = conn.execute("SELECT namespace, key, value, stored_at FROM metadata WHERE host=?", (host,)).fetchall()
+        finally:
+            conn.close()
+        for namespace, key, value, stored_at in rows:
+            ttl = self.ttl.get(namespace)
+            if ttl is not None and now-stored_at > ttl:
+                continue
+            metadata.setdefault(namespace, dict())[key] = json.loads(value)
+        return metadata
+
+    def save(self, host, metadata, loaded=None):
+        # entries still holding the value loaded from the cache (loaded: {namespace: {key: value}}) keep their
+        # original timestamp, so that the ttl still applies; the others were resolved in this run and are stamped now.
+        now = time.time()
+        loaded = loaded or {}
+        rows = [
+            (host, namespace, key, json.dumps(value, ensure_ascii=False, sort_keys=True), now)
+            for namespace, entries in metadata.items() if namespace in self.ttl
+            for key, value in entries.items()
+            if key not in loaded.get(namespace, {}) or loaded[namespace][key]!=value
+        ]
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO metadata (host, namespace, key, value, stored_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (host, namespace, key) DO UPDATE SET value=excluded.value, stored_at=excluded.stored_at",
+                    rows
+                )
+        finally:
+            conn.close()
+
+    def invalidate(self, host=None, namespace=None, key=None):
+        conditions, params = [], []
+        for column, value in (("host", host), ("namespace", namespace), ("key", key)):
+            if value is not None:
+                conditions.append(f"{column}=?")
+                params.append(value)
+        where = " WHERE "+" AND ".join(conditions) if conditions else ""
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM metadata"+where, params)
+        finally:
+            conn.close()
+
+
+class CheckpointJournal:
+    # append-only journal (one json record per line) of the assets and columns completed by a mapping run,
+    # with the ids they were resolved to. a run with resume=True replays it and only does the remaining work.
+    def __init__(self, path='wkc-mapping-journal.jsonl'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False)+"\n"
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(line)
+            self.file.flush()
+
+    def record_asset(self, catalog_name, asset_name, digest, status, catalog_id=None, asset_id=None):
+        self.append({"event": "asset", "catalog": catalog_name, "asset": asset_name, "digest": digest, "status": status, "catalog_id": catalog_id, "asset_id": asset_id})
+
+    def record_columns(self, catalog_name, asset_name, column2term_id):
+        self.append({"event": "columns", "catalog": catalog_name, "asset": asset_name, "columns": column2term_id})
+
+    def replay(self):
+        # returns the finished assets {(catalog, asset): record} and the patched columns {(catalog, asset): {column: term_id}}.
+        # a line cut off by a crash is ignored.
+        assets, columns = dict(), dict()
+        if not os.path.exists(self.path):
+            return assets, columns
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                key = (record["catalog"], record["asset"])
+                if record["event"]=="asset":
+                    assets[key] = record
+                elif record["event"]=="columns":
+                    columns.setdefault(key, dict()).update(record["columns"])
+        return assets, columns
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def clear(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TableWriter:
+    # appends dataframes to one csv file or, for a path ending with .parquet, to one parquet file (requires pyarrow).
+    # rows are written as they come, so a large export is never held in memory.
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.lock = threading.Lock()
+        self.writer = None
+        self.parquet = path.endswith('.parquet')
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self.schema = pa.schema([(column, pa.string()) for column in columns])
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            import pandas as pd
+            pd.DataFrame(columns=columns).to_csv(path, index=False)
+
+    def write(self, rows):
+        import pandas as pd
+        df = pd.DataFrame(rows, columns=self.columns, dtype=object)
+        with self.lock:
+            if self.parquet:
+                import pyarrow as pa
+                self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+            else:
+                df.to_csv(self.path, mode='a', header=False, index=False)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class MappingPlan:
+    # execution plan of a mapping csv: the unique catalogs, categories, business terms and assets to resolve,
+    # the write batches per asset, and the estimated api calls per endpoint family and runtime
+    def __init__(self, map_bizterm_csv):
+        self.map_bizterm_csv = map_bizterm_csv
+        self.rows = 0
+        self.categories = set()
+        self.bizterms = set()
+        self.catalog2assets = dict()
+        self.issues = []
+        self.requests = dict()
+        # endpoint families whose request count is only a lower bound
+        self.lower_bounds = set()
+        self.seconds = dict()
+
+    @property
+    def assets(self):
+        return sum(len(assets) for assets in self.catalog2assets.values())
+
+    def summary(self):
+        return {
+            "csv": self.map_bizterm_csv,
+            "rows": self.rows,
+            "catalogs": len(self.catalog2assets),
+            "categories": len(self.categories),
+            "bizterms": len(self.bizterms),
+            "assets": self.assets,
+            "requests": dict(self.requests),
+            "lower_bounds": sorted(self.lower_bounds),
+            "seconds": round(sum(self.seconds.values()), 1),
+            "issues": list(self.issues),
+        }
+
+    def print(self):
+        print('='*100)
+        print(f"plan of {self.map_bizterm_csv}: {self.rows} rows, {len(self.catalog2assets)} catalogs, {self.assets} assets, {len(self.categories)} categories, {len(self.bizterms)} business terms")
+        lower_bound = lambda endpoint: ">=" if endpoint in self.lower_bounds else ""
+        print("estimated requests: "+", ".join(f"{endpoint} {lower_bound(endpoint)}{count}" for endpoint, count in self.requests.items())+f" (total {'>=' if self.lower_bounds else ''}{sum(self.requests.values())})")
+        print(f"estimated runtime: {'>=' if self.lower_bounds else ''}{sum(self.seconds.values()):.1f} seconds ("+", ".join(f"{endpoint} {seconds:.1f}s" for endpoint, seconds in self.seconds.items())+")")
+        for issue in self.issues:
+            print(f"warning: {issue}")
+        print('='*100)
+
+
+def rows_digest(rows):
+    # fingerprint of the mapping rows of one asset, so that a resumed run redoes an asset whose rows have changed
+    content = "\n".join(sorted(f"{row.ColumnHeader}\x00{row.BusinessTerm}\x00{row.Category}" for row in rows.itertuples()))
+    return f"{zlib.crc32(content.encode('utf-8')):08x}"
+
+
+class SingleFlight:
+    # coalesces concurrent calls with the same key into one: the first caller runs fn and the others wait for its result
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = dict()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {"done": threading.Event(), "result": None, "error": None}
+            else:
+                self.coalesced += 1
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = fn()
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call["done"].set()
+        return call["result"]
+
+
+class TokenManager:
+    # bearer token of one user, fetched again refresh_margin seconds before the expiry decoded from the jwt.
+    # with cache_path the token is shared through a json file by all the processes of a host, and an exclusive
+    # lock on <cache_path>.lock lets only one of them authenticate at a time.
+    def __init__(self, fetch, key, cache_path=None, refresh_margin=DEFAULT_TOKEN_REFRESH_MARGIN):
+        self.fetch = fetch
+        self.key = key
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.token = None
+        self.expires_at = None
+        self.refreshes = 0
+        self.lock = threading.Lock()
+
+    def valid(self, token, expires_at):
+        return token is not None and (expires_at is None or time.time() < expires_at-self.refresh_margin)
+
+    def get(self):
+        if self.valid(self.token, self.expires_at):
+            return self.token
+        with self.lock:
+            if not self.valid(self.token, self.expires_at):
+                self.refresh()
+            return self.token
+
+    def invalidate(self, token):
+        # called with a token rejected by the server: a new one is fetched, unless another worker already did
+        with self.lock:
+            if self.token==token:
+                self.refresh(stale=token)
+            return self.token
+
+    def refresh(self, stale=None):
+        with self.file_lock():
+            token, expires_at = self.read_cache()
+            if token==stale or not self.valid(token, expires_at):
+                token = self.fetch()
+                expires_at = jwt_expiry(token)
+                self.refreshes += 1
+                self.write_cache(token, expires_at)
+            self.token, self.expires_at = token, expires_at
+
+    @contextlib.contextmanager
+    def file_lock(self):
+        if self.cache_path is None or fcntl is None:
+            yield
+            return
+        with open(self.cache_path+'.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read_tokens(self):
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return dict()
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                return json.load(f)
+        except ValueError:
+            return dict()
+
+    def read_cache(self):
+        entry = self.read_tokens().get(self.key) or {}
+        return entry.get('token'), entry.get('expires_at')
+
+    def write_cache(self, token, expires_at):
+        # the file is replaced atomically and only readable by its owner
+        if self.cache_path is None:
+            return
+        tokens = self.read_tokens()
+        tokens[self.key] = {'token': token, 'expires_at': expires_at}
+        fd, path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.cache_path)))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(tokens, f)
+        os.replace(path, self.cache_path)
+
+
 class WatsonKnowledgeCatalog(metaclass=ABCMeta):
-    def __init__(self, cpd_cluster_host, logger=logger):
+    def __init__(self, cpd_cluster_host, logger=logger, pool_size=DEFAULT_POOL_SIZE, keep_alive=True, endpoint_policy=None, cache=None, exporters=None, quiet=False, flow_controller=None, token_cache=None, token_refresh_margin=DEFAULT_TOKEN_REFRESH_MARGIN, negative_ttl=DEFAULT_NEGATIVE_TTL, verify=False):
         self.cpd_cluster_host = cpd_cluster_host
+        if logger is logging.getLogger('API Error Log'):
+            setup_logging()
         self.logger=logger
+        self.verify = verify
+        self.quiet = quiet
+        self.metrics = RequestMetrics()
+        self.exporters = exporters if exporters is not None else []
+        self.token_manager = None
+        self.token_cache = token_cache
+        self.token_refresh_margin = token_refresh_margin
         self.token = None
         self.metadata = {
             "catalog2id":{},
             "category2id":{},
             "categorypath2biztermdict":{},
+            "asset2id":{},
+            "categorypath2termcount":{},
         }
+        # names found missing, with the time they were looked up: {namespace: {key: time}}
+        self.missing = dict()
+        self.negative_ttl = negative_ttl
+        self.single_flight = SingleFlight()
+        self.duplicate_assets = dict()
+        self.diff = None
+        self.journal = None
+        self.patched_columns = dict()
+        self.category_index = None
+        self.category_tree = None
+        self.bizterm_indexes = dict()
+        self.endpoint_policy = dict(DEFAULT_ENDPOINT_POLICY)
+        if endpoint_policy is not None:
+            self.endpoint_policy.update(endpoint_policy)
+        self.session = self.create_session(pool_size, keep_alive)
+        self.flow_controller = flow_controller if flow_controller is not None else FlowController(max_concurrency=pool_size)
+        self.cache = MetadataCache(cache) if isinstance(cache, str) else cache
+        self.cached_metadata = dict()
+        if self.cache is not None:
+            self.load_cache()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     @abstractmethod
     def get_token(self):
         pass
 
+    @property
+    def token(self):
+        # the bearer token of the user, refreshed by the token manager before it expires
+        if self.token_manager is not None:
+            return self.token_manager.get()
+        return self._token
+
+    @token.setter
+    def token(self, token):
+        self._token = token
+
+    def authorize(self, fetch, username):
+        # fetch() authenticates and returns a new token. tokens are shared by every worker of this instance
+        # and, with token_cache, by the other instances and processes of the same user and host.
+        self.token_manager = TokenManager(fetch, f"{username}@{self.cpd_cluster_host}", self.token_cache, self.token_refresh_margin)
+        return self.token_manager.get()
+
+    def create_session(self, pool_size=DEFAULT_POOL_SIZE, keep_alive=True):
+        # one long-lived session per instance, so that every call reuses the pooled tcp/tls connections
+        s = requests.session()
+        s.verify = self.verify
+        if self.verify is False:
+            # the clusters often use self-signed certificates: silence the warning for this host only
+            warnings.filterwarnings('ignore', message=re.escape(f"Unverified HTTPS request is being made to host '{urlparse(self.cpd_cluster_host).hostname}'"), category=InsecureRequestWarning)
+        s.headers['Connection'] = "keep-alive" if keep_alive else "close"
+        for scheme in ('https://', 'http://'):
+            s.mount(scheme, TimeoutHTTPAdapter(max_retries=ThrottleRetry(**DEFAULT_RETRY), pool_connections=pool_size, pool_maxsize=pool_size))
+        for path, policy in self.endpoint_policy.items():
+            retry = ThrottleRetry(**{**DEFAULT_RETRY, **policy.get("retry", {})})
+            adapter = TimeoutHTTPAdapter(
+                max_retries=retry,
+                timeout=policy.get("timeout", DEFAULT_TIMEOUT),
+                pool_connections=pool_size,
+                pool_maxsize=pool_size
+            )
+            s.mount(f"{self.cpd_cluster_host}{path}", adapter)
+        return s
+
+    def request(self, method, path, endpoint=None, **kwargs):
+        endpoint = endpoint or endpoint_family(method, path)
+        r = self.send(method, path, endpoint, **kwargs)
+        headers = kwargs.get('headers') or {}
+        if r.status_code==401 and self.token_manager is not None and 'Authorization' in headers:
+            # the token expired or was revoked: retry once with a fresh one
+            stale = headers['Authorization'][len("Bearer "):]
+            r.close()
+            kwargs['headers'] = {**headers, 'Authorization': "Bearer "+self.token_manager.invalidate(stale)}
+            r = self.send(method, path, endpoint, **kwargs)
+        return r
+
+    def send(self, method, path, endpoint, **kwargs):
+        # a throttled answer has paused every call in the flow controller (see ThrottleRetry): send it again after it
+        for attempt in range(DEFAULT_THROTTLE_RETRIES):
+            r = self.send_once(method, path, endpoint, attempt>0, **kwargs)
+            if r.status_code not in THROTTLE_STATUS:
+                return r
+            r.close()
+        return self.send_once(method, path, endpoint, True, **kwargs)
+
+    def send_once(self, method, path, endpoint, resent=False, **kwargs):
+        # verify is passed per request: requests lets REQUESTS_CA_BUNDLE/CURL_CA_BUNDLE override the session's verify
+        kwargs.setdefault('verify', self.verify)
+        self.flow_controller.acquire()
+        start = time.perf_counter()
+        try:
+            r = self.session.request(method, f"{self.cpd_cluster_host}{path}", **kwargs)
+        except requests.exceptions.RequestException:
+            latency = time.perf_counter()-start
+            self.flow_controller.release(latency)
+            self.metrics.observe(endpoint, latency)
+            raise
+        latency = time.perf_counter()-start
+        retries = getattr(getattr(r.raw, 'retries', None), 'history', None) or ()
+        throttled = r.status_code in THROTTLE_STATUS
+        retry_after = parse_retry_after(r.headers.get('Retry-After')) if throttled else None
+        self.flow_controller.release(latency, r.status_code, throttled, retry_after)
+        body = r.request.body or b''
+        # the body of a streamed response is not read here: its size on the wire is counted instead
+        received = int(r.headers.get('Content-Length') or 0) if kwargs.get('stream') else len(r.content)
+        self.metrics.observe(endpoint, latency, r.status_code, len(retries)+int(resent), len(body), received, throttled)
+        return r
+
+    def print(self, *args, **kwargs):
+        # progress messages per row / asset, turned off with quiet=True
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def export_metrics(self):
+        for exporter in self.exporters:
+            exporter.export(self.metrics)
+
+    def load_cache(self):
+        # the loaded entries are kept aside, so that save_cache does not refresh their timestamp
+        self.cached_metadata = self.cache.load(self.cpd_cluster_host)
+        for namespace, entries in self.cached_metadata.items():
+            if namespace in self.metadata:
+                self.metadata[namespace].update(entries)
+        self.print(f"{sum(len(entries) for entries in self.metadata.values())} metadata entries are loaded from {self.cache.path}.")
+
+    def save_cache(self):
+        if self.cache is not None:
+            self.cache.save(self.cpd_cluster_host, self.metadata, self.cached_metadata)
+
+    def invalidate_cache(self, namespace=None, key=None):
+        # drop entries from memory and from the on-disk cache, so that they are resolved again on the next lookup
+        namespaces = self.metadata.keys() if namespace is None else [namespace]
+        for each in namespaces:
+            if key is None:
+                self.metadata[each].clear()
+                self.missing.pop(each, None)
+                self.cached_metadata.pop(each, None)
+            else:
+                self.metadata[each].pop(key, None)
+                self.missing.get(each, {}).pop(key, None)
+                self.cached_metadata.get(each, {}).pop(key, None)
+        if self.cache is not None:
+            self.cache.invalidate(self.cpd_cluster_host, namespace, key)
+
+    def resolve(self, namespace, key, lookup):
+        # concurrent lookups of the same key share one call (single-flight), and a key resolved to None
+        # is kept in self.missing, so that it is answered without any call for negative_ttl seconds
+        value = self.single_flight.do((namespace, key), lookup)
+        if value is None:
+            self.missing.setdefault(namespace, dict())[key] = time.time()
+        return value
+
+    def is_missing(self, namespace, key):
+        missing_at = self.missing.get(namespace, {}).get(key)
+        if missing_at is None:
+            return False
+        if time.time()-missing_at > self.negative_ttl:
+            self.missing[namespace].pop(key, None)
+            return False
+        return True
+
+    def close(self):
+        self.save_cache()
+        self.export_metrics()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
     def get_catalog_id(self, catalog_name):
         if catalog_name in self.metadata['catalog2id'].keys():
+            self.metrics.lookup('catalog2id', True)
             return self.metadata['catalog2id'][catalog_name]
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry))
+        missing = self.is_missing('catalog2id', catalog_name)
+        self.metrics.lookup('catalog2id', missing)
+        if missing:
+            return None
+        return self.resolve('catalog2id', catalog_name, partial(self.lookup_catalog_id, catalog_name))
+
+    def lookup_catalog_id(self, catalog_name):
         headers = {
             'Content-Type': "application/json",
             'Authorization': "Bearer "+self.token
         }
-        print(f"getting catalog id of {catalog_name}.. ")
+        self.print(f"getting catalog id of {catalog_name}.. ")
         try:
-            r = s.get(
-                f"{self.cpd_cluster_host}/v2/catalogs", 
-                verify=False, 
-                headers=headers
+            r = self.request(
+                "GET",
+                "/v2/catalogs",
+                headers=headers,
+                stream=True
             )
         except requests.exceptions.RequestException as e:
             self.logger.error(str(e))
             raise SystemExit(e)
-        finally:
-            s.close()
-        catalogs = json.loads(r.text)['catalogs']
-
-        catalog_id = None
-        for catalog in catalogs:
-            if catalog['entity']['name'] == catalog_name:
-                catalog_id = catalog['metadata']['guid']
-                self.metadata['catalog2id'][catalog_name] = catalog_id
-                break
+
+        # one listing resolves every catalog, also when the name differs only in spacing, case or unicode form.
+        # only the name and guid of each catalog are kept from the streamed listing.
+        catalog_index = GlossaryIndex({catalog['entity']['name']: catalog['metadata']['guid'] for catalog in json_items(r, 'catalogs.item')})
+        self.metadata['catalog2id'].update(catalog_index.name2id)
+        catalog_id = catalog_index.lookup(catalog_name)
         if catalog_id is None:
-            print(f"The provided catalog name ({catalog_name}) does not exist!")
-        
+            self.print(f"The provided catalog name ({catalog_name}) does not exist! Did you mean: {', '.join(catalog_index.suggest(catalog_name))}?")
+            return None
+        self.metadata['catalog2id'][catalog_name] = catalog_id
         return catalog_id
     
     def get_category_id(self, category_path):
         if category_path in self.metadata['category2id'].keys():
+            self.metrics.lookup('category2id', True)
             return self.metadata['category2id'][category_path]
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry,timeout=10))
+        missing = self.is_missing('category2id', category_path)
+        self.metrics.lookup('category2id', missing)
+        if missing:
+            return None
+        return self.resolve('category2id', category_path, partial(self.lookup_category_id, category_path))
+
+    def lookup_category_id(self, category_path):
+        if self.category_index is not None:
+            category_id = None
+            for category_name in [each.strip() for each in category_path.split('>>')]:
+                category_id = self.category_index.get((category_id, category_name))
+                if category_id is None:
+                    break
+            if category_id is None:
+                self.print(f"The provided category path ({category_path}) does not exist!")
+                return None
+            self.metadata['category2id'][category_path] = category_id
+            return category_id
         headers = {
             'Content-Type': "application/json",
             'Authorization': "Bearer "+self.token,
@@ -103,7 +1116,7 @@ class WatsonKnowledgeCatalog(metaclass=ABCMeta):
             # 'Connection': "keep-alive"
         }
         payload = {
-            "_source": ["artifact_id","metadata.name","categories"],
+            "_source": ["artifact_id","metadata.name","categories.primary_category_name"],
             "query": {
                 "bool": {
                     "must":[
@@ -114,20 +1127,20 @@ class WatsonKnowledgeCatalog(metaclass=ABCMeta):
                 }
             }
         }
-        print(f"searching category id of {category_path}.. ")
+        self.print(f"searching category id of {category_path}.. ")
         try:
-            r = s.post(
-                f"{self.cpd_cluster_host}/v3/search",
-                verify=False,
+            r = self.request(
+                "POST",
+                "/v3/search",
+                endpoint="category_search",
                 json=payload,
-                headers=headers
+                headers=headers,
+                stream=True
             )
         except requests.exceptions.RequestException as e:
             self.logger.error(str(e))
             raise SystemExit(e)
-        finally:
-            s.close()
-        rows = json.loads(r.text)['rows']
+        rows = json_items(r, 'rows.item')
 
         category_hierarchy = [each.strip() for each in category_path.split('>>')]
         category_name= category_hierarchy[-1]
@@ -142,248 +1155,475 @@ class WatsonKnowledgeCatalog(metaclass=ABCMeta):
                     self.metadata['category2id'][category_path] = category_id
                     break
         if category_id is None:
-            print(f"The provided catalog name ({category_path}) does not exist!")
+            self.print(f"The provided category path ({category_path}) does not exist!")
         return category_id
     
-    def get_asset_id(self, asset_name, catalog_name):
-        catalog_id = self.get_catalog_id(catalog_name)
-        if catalog_id is None:
-            return None
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry,timeout=10))
-        search_body={
-            "query": f"asset.name:{asset_name}"
+    def search_artifacts(self, query, source, page_size=DEFAULT_PAGE_SIZE, endpoint="search"):
+        # page through /v3/search and yield every row of the given query. the rows are sorted on artifact_id and each
+        # page starts after the last artifact_id of the previous one (search_after), so that paging is stable and not
+        # bounded by the 10000 rows window of from/size. it stops at the total size of the response or an empty page.
+        headers = {
+            'Content-Type': "application/json",
+            'Authorization': "Bearer "+self.token,
+            'Cache-Control': "no-cache",
         }
+        if "artifact_id" not in source:
+            source = list(source)+["artifact_id"]
+        last_id, count = None, 0
+        while True:
+            payload={
+                "size": page_size,
+                "_source": source,
+                "query": query,
+                "sort": [{"artifact_id": {"order": "asc"}}]
+            }
+            if last_id is not None:
+                payload["search_after"] = [last_id]
+            try:
+                r = self.request(
+                    "POST",
+                    "/v3/search",
+                    endpoint=endpoint,
+                    headers=headers,
+                    json=payload,
+                    stream=True
+                )
+            except requests.exceptions.RequestException as e:
+                self.logger.error(str(e))
+                raise SystemExit(e)
+            fields, page = dict(), 0
+            for row in json_items(r, 'rows.item', fields):
+                page += 1
+                last_id = row['artifact_id']
+                yield row
+            count += page
+            if page==0 or count >= fields.get('size', float('inf')):
+                break
+
+    def build_category_index(self, page_size=DEFAULT_PAGE_SIZE):
+        # pull every category with its parent id once and keep the tree in memory,
+        # so that get_category_id matches the full path locally in O(depth).
+        self.print(f"building category index.. ")
+        query = {"bool": {"filter": [{"term": {"metadata.artifact_type": "category"}}]}}
+        categories = dict()
+        for row in self.search_artifacts(query, ["artifact_id", "metadata.name", "categories.primary_category_id"], page_size, "category_search"):
+            categories[row['artifact_id']] = (row['metadata']['name'], row.get('categories', {}).get('primary_category_id'))
+        self.category_index = dict()
+        for category_id, (category_name, parent_id) in categories.items():
+            if parent_id not in categories:
+                parent_id = None
+            self.category_index[(parent_id, category_name.strip())] = category_id
+        self.category_tree = categories
+        self.print(f"{len(categories)} categories are indexed.")
+
+    def refresh_category_index(self, page_size=DEFAULT_PAGE_SIZE):
+        # call after the glossary has changed: drop the resolved category paths and rebuild the tree
+        self.invalidate_cache('category2id')
+        self.invalidate_cache('categorypath2biztermdict')
+        self.build_category_index(page_size)
+
+    def category_paths(self):
+        # full paths of every indexed category, ex. 'CreDB >> SubCategoryA'
+        def path(category_id):
+            category_name, parent_id = self.category_tree[category_id]
+            if parent_id not in self.category_tree:
+                return category_name.strip()
+            return path(parent_id)+" >> "+category_name.strip()
+        return [path(category_id) for category_id in self.category_tree.keys()]
+
+    def search_assets(self, catalog_id, query, page_size=DEFAULT_PAGE_SIZE):
+        # page through the asset search of a catalog with the bookmark of each response
         headers = {
             'Content-Type': "application/json",
             'Authorization': "Bearer "+self.token
         }
-        print(f"searching asset id of {asset_name} in {catalog_name}.. ")
-        try:
-            r = s.post(
-                f"{self.cpd_cluster_host}/v2/asset_types/asset/search?catalog_id="+catalog_id,
-                json=search_body,
-                verify=False, 
-                headers=headers
-            )
-        except requests.exceptions.RequestException as e:
-            self.logger.error(str(e))
-            raise SystemExit(e)
-        finally:
-            s.close()
-        results = json.loads(r.text)['results']
+        search_body={
+            "query": query,
+            "limit": page_size
+        }
+        while search_body is not None:
+            try:
+                r = self.request(
+                    "POST",
+                    "/v2/asset_types/asset/search?catalog_id="+catalog_id,
+                    json=search_body,
+                    headers=headers
+                )
+                # a failed search is an error, not "no results": its names must not be taken as missing
+                r.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                self.logger.error(str(e))
+                raise SystemExit(e)
+            r_json = json.loads(r.content)
+            yield from r_json.get('results', [])
+            search_body = r_json.get('next')
+
+    def get_asset_id(self, asset_name, catalog_name):
+        asset_key = f"{catalog_name} >> {asset_name}"
+        if asset_key in self.metadata['asset2id'].keys():
+            self.metrics.lookup('asset2id', True)
+            return self.metadata['asset2id'][asset_key]
+        missing = self.is_missing('asset2id', asset_key)
+        self.metrics.lookup('asset2id', missing)
+        if missing:
+            return None
+        return self.resolve('asset2id', asset_key, partial(self.lookup_asset_id, asset_name, catalog_name))
+
+    def lookup_asset_id(self, asset_name, catalog_name):
+        asset_key = f"{catalog_name} >> {asset_name}"
+        catalog_id = self.get_catalog_id(catalog_name)
+        if catalog_id is None:
+            return None
+        self.print(f"searching asset id of {asset_name} in {catalog_name}.. ")
         asset_id = None
-        for result in results:
+        for result in self.search_assets(catalog_id, f"asset.name:{asset_name}"):
             if result['metadata']['name']==asset_name:
                 asset_id= result['metadata']['asset_id']
+                self.metadata['asset2id'][asset_key] = asset_id
                 break
         if asset_id is None:
-            print(f"The provided asset name ({asset_name}) does not exist in catalog name ({catalog_name})!")
+            self.print(f"The provided asset name ({asset_name}) does not exist in catalog name ({catalog_name})!")
         return asset_id
+
+    def resolve_asset_ids(self, catalog_name, asset_names, chunk_size=DEFAULT_ASSET_CHUNK_SIZE, page_size=DEFAULT_PAGE_SIZE):
+        # resolve many asset names of one catalog with OR-combined name queries of chunk_size names each.
+        # returns an asset name -> asset id map; assets sharing a name are reported in self.duplicate_assets
+        # and mapped to the first id found, as get_asset_id does.
+        asset2id = dict()
+        catalog_id = self.get_catalog_id(catalog_name)
+        if catalog_id is None:
+            return asset2id
+        asset_names = sorted(set(asset_names))
+        pending = [
+            asset_name for asset_name in asset_names
+            if f"{catalog_name} >> {asset_name}" not in self.metadata['asset2id'] and not self.is_missing('asset2id', f"{catalog_name} >> {asset_name}")
+        ]
+        self.print(f"resolving {len(pending)} asset ids in {catalog_name}.. ")
+        found = dict()
+        searched = set(pending)
+        for start in range(0, len(pending), chunk_size):
+            chunk = set(pending[start:start+chunk_size])
+            query = " OR ".join('asset.name:"{}"'.format(asset_name.replace('"', '\\"')) for asset_name in chunk)
+            for result in self.search_assets(catalog_id, query, page_size):
+                if result['metadata']['name'] in chunk:
+                    found.setdefault(result['metadata']['name'], []).append(result['metadata']['asset_id'])
+        for asset_name, asset_ids in found.items():
+            asset_ids = list(dict.fromkeys(asset_ids))
+            if len(asset_ids)>1:
+                self.print(f"The provided asset name ({asset_name}) is duplicated in catalog name ({catalog_name}): {asset_ids}")
+                self.logger.error(f"duplicated asset name {asset_name} in {catalog_name}: {asset_ids}")
+                self.duplicate_assets.setdefault(catalog_name, dict())[asset_name] = asset_ids
+            self.metadata['asset2id'][f"{catalog_name} >> {asset_name}"] = asset_ids[0]
+        for asset_name in asset_names:
+            asset_id = self.metadata['asset2id'].get(f"{catalog_name} >> {asset_name}")
+            if asset_id is None:
+                if asset_name in searched:
+                    self.print(f"The provided asset name ({asset_name}) does not exist in catalog name ({catalog_name})!")
+                    self.missing.setdefault('asset2id', dict())[f"{catalog_name} >> {asset_name}"] = time.time()
+                continue
+            asset2id[asset_name] = asset_id
+        return asset2id
+
+    def list_assets(self, catalog_name, page_size=DEFAULT_PAGE_SIZE):
+        # names of all the assets of a catalog, with their ids kept in metadata['asset2id']
+        catalog_id = self.get_catalog_id(catalog_name)
+        if catalog_id is None:
+            return []
+        self.print(f"listing assets in {catalog_name}.. ")
+        asset_names = dict()
+        for result in self.search_assets(catalog_id, "*:*", page_size):
+            asset_name = result['metadata']['name']
+            asset_names[asset_name] = None
+            self.metadata['asset2id'].setdefault(f"{catalog_name} >> {asset_name}", result['metadata']['asset_id'])
+        return list(asset_names)
+
     def view_asset_info(self, asset_name, catalog_name):
         catalog_id = self.get_catalog_id(catalog_name)
         asset_id = self.get_asset_id(asset_name, catalog_name)
         
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry))
         headers = {
             'Content-Type': "application/json",
             'Authorization': "Bearer "+self.token
         }
-        print(f"getting asset info of {asset_name} in {catalog_name}.. ")
+        self.print(f"getting asset info of {asset_name} in {catalog_name}.. ")
         try:
-            r = s.get(
-                f"{self.cpd_cluster_host}/v2/assets/{asset_id}?catalog_id={catalog_id}", 
-                verify=False, 
+            r = self.request(
+                "GET",
+                f"/v2/assets/{asset_id}?catalog_id={catalog_id}",
                 headers=headers
             )
         except requests.exceptions.RequestException as e:
             self.logger.error(str(e))
             raise SystemExit(e)
-        finally:
-            s.close()
-        r_json = json.loads(r.text)
+        r_json = json.loads(r.content)
         print(json.dumps(r_json, indent=4))
 
-    def create_attribute(self, asset_name, catalog_name):
+    def create_attribute(self, asset_name, catalog_name, column_info=None):
         catalog_id = self.get_catalog_id(catalog_name)
         asset_id = self.get_asset_id(asset_name, catalog_name)
         
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry))
         headers = {
             'Content-Type': "application/json",
             'Authorization': "Bearer "+self.token
         }
         payload = {
             "name": "column_info",
-            "entity":{
-            }
+            "entity": column_info or {}
         }
-        print(f"creating column_info attribute of {asset_name} in {catalog_name}.. ")
+        self.print(f"creating column_info attribute of {asset_name} in {catalog_name}.. ")
         try: 
-            r=s.post(
-                f"{self.cpd_cluster_host}/v2/assets/{asset_id}/attributes?catalog_id={catalog_id}",
+            r = self.request(
+                "POST",
+                f"/v2/assets/{asset_id}/attributes?catalog_id={catalog_id}",
                 json=payload,
-                headers=headers,
-                verify=False
+                headers=headers
             )
         except requests.exceptions.RequestException as e:
-            print('Fail to create attribute')
+            self.print('Fail to create attribute')
             self.logger.error(str(e))
             raise SystemExit(e)
-        finally:
-            s.close()
+        return r
+
     def view_attribute(self, asset_name, catalog_name):
         catalog_id = self.get_catalog_id(catalog_name)
         asset_id = self.get_asset_id(asset_name, catalog_name)
         
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry))
         headers = {
             'Content-Type': "application/json",
             'Authorization': "Bearer "+self.token
         }
-        print(f"getting column_info attribute of {asset_name} in {catalog_name}.. ")
+        self.print(f"getting column_info attribute of {asset_name} in {catalog_name}.. ")
         try: 
-            r=s.get(
-                f"{self.cpd_cluster_host}/v2/assets/{asset_id}/attributes/column_info?catalog_id={catalog_id}",
-                headers=headers,
-                verify=False
+            r = self.request(
+                "GET",
+                f"/v2/assets/{asset_id}/attributes/column_info?catalog_id={catalog_id}",
+                headers=headers
             )
         except requests.exceptions.RequestException as e:
-            print('Fail to get attribute')
+            self.print('Fail to get attribute')
             self.logger.error(str(e))
             raise SystemExit(e)
-        finally:
-            s.close()
-        r_json = json.loads(r.text)
+        r_json = json.loads(r.content)
         print(json.dumps(r_json, indent=4))
             
+    def get_attribute(self, asset_name, catalog_name):
+        # column_info attribute of an asset as a dict ({column: {"column_terms": [..]}}), None if it does not exist
+        catalog_id = self.get_catalog_id(catalog_name)
+        asset_id = self.get_asset_id(asset_name, catalog_name)
+        if None in set([catalog_id, asset_id]):
+            return None
+        headers = {
+            'Content-Type': "application/json",
+            'Authorization': "Bearer "+self.token
+        }
+        try: 
+            r = self.request(
+                "GET",
+                f"/v2/assets/{asset_id}/attributes/column_info?catalog_id={catalog_id}",
+                headers=headers
+            )
+        except requests.exceptions.RequestException as e:
+            self.print('Fail to get attribute')
+            self.logger.error(str(e))
+            raise SystemExit(e)
+        if r.status_code==404:
+            return None
+        r.raise_for_status()
+        r_json = json.loads(r.content)
+        return r_json.get('column_info', r_json)
+
+    def patch_attribute(self, asset_name, catalog_name, operations):
+        # send a list of json patch operations on the column_info attribute in one request
+        catalog_id = self.get_catalog_id(catalog_name)
+        asset_id = self.get_asset_id(asset_name, catalog_name)
+        if None in set([catalog_id, asset_id]):
+            return
+        headers = {
+            'Content-Type': "application/json",
+            'Authorization': "Bearer "+self.token
+        }
+        self.print(f"patching {len(operations)} columns of column_info attribute of {asset_name} in {catalog_name}.. ")
+        try: 
+            r = self.request(
+                "PATCH",
+                f"/v2/assets/{asset_id}/attributes/column_info?catalog_id={catalog_id}",
+                json=operations,
+                headers=headers
+            )
+        except requests.exceptions.RequestException as e:
+            self.print('Fail to update attribute')
+            self.logger.error(str(e))
+            raise SystemExit(e)
+        return r
+
+    def patch_attribute_in_batches(self, asset_name, catalog_name, operations, batch_size=DEFAULT_BATCH_SIZE, on_patched=None):
+        # send the operations as patch documents of at most batch_size operations, to stay under the payload limit.
+        # a failed chunk falls back to one request per operation, and the columns failing on their own are raised.
+        # on_patched(operations) is called after each successful request (ex. to journal the columns).
+        on_patched = on_patched or (lambda operations: None)
+        failed = []
+        for start in range(0, len(operations), batch_size):
+            chunk = operations[start:start+batch_size]
+            try:
+                r = self.patch_attribute(asset_name, catalog_name, chunk)
+                if r.ok:
+                    on_patched(chunk)
+                    continue
+                self.logger.error(f"patch of {len(chunk)} columns of {asset_name} in {catalog_name} failed ({r.status_code}): {r.text}")
+            except SystemExit as e:
+                self.logger.error(f"patch of {len(chunk)} columns of {asset_name} in {catalog_name} failed: {e}")
+            if len(chunk)==1:
+                failed += chunk
+                continue
+            self.print(f"retrying {len(chunk)} columns of {asset_name} in {catalog_name} one by one.. ")
+            for operation in chunk:
+                try:
+                    r = self.patch_attribute(asset_name, catalog_name, [operation])
+                    if r.ok:
+                        on_patched([operation])
+                        continue
+                    self.logger.error(f"patch of {operation['path']} of {asset_name} in {catalog_name} failed ({r.status_code}): {r.text}")
+                except SystemExit as e:
+                    self.logger.error(f"patch of {operation['path']} of {asset_name} in {catalog_name} failed: {e}")
+                failed.append(operation)
+        if len(failed)>0:
+            raise RuntimeError(f"{len(failed)} columns failed: {', '.join(operation['path'] for operation in failed)}")
+
     def delete_attribute(self, asset_name, catalog_name):
         catalog_id = self.get_catalog_id(catalog_name)
         asset_id = self.get_asset_id(asset_name, catalog_name)
         
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry))
         headers = {
             'Content-Type': "application/json",
             'Authorization': "Bearer "+self.token
         }
-        print(f"deleting column_info attribute of {asset_name} in {catalog_name}.. ")
+        self.print(f"deleting column_info attribute of {asset_name} in {catalog_name}.. ")
         try: 
-            r=s.delete(
-                f"{self.cpd_cluster_host}/v2/assets/{asset_id}/attributes/column_info?catalog_id={catalog_id}",
-                headers=headers,
-                verify=False
+            r = self.request(
+                "DELETE",
+                f"/v2/assets/{asset_id}/attributes/column_info?catalog_id={catalog_id}",
+                headers=headers
             )
         except requests.exceptions.RequestException as e:
-            print('Fail to delete attribute')
+            self.print('Fail to delete attribute')
             self.logger.error(str(e))
             raise SystemExit(e)
-        finally:
-            s.close()
+        return r
+
+    def bizterm_index(self, category_path):
+        # GlossaryIndex of the business terms of a category path, rebuilt when its terms have been reloaded
+        bizterm2id = self.metadata['categorypath2biztermdict'][category_path]
+        index = self.bizterm_indexes.get(category_path)
+        if index is None or index.source is not bizterm2id:
+            index = GlossaryIndex(bizterm2id)
+            self.bizterm_indexes[category_path] = index
+        return index
+
+    def bizterm_display_name(self, bizterm, category_path):
+        # glossary spelling of a resolved business term, written as term_display_name instead of the csv spelling
+        return self.bizterm_index(category_path).canonical(bizterm) or bizterm
+
     def get_bizterm_id(self, bizterm, category_path):
-        if category_path in self.metadata['categorypath2biztermdict'].keys():
-            if bizterm not in self.metadata['categorypath2biztermdict'][category_path].keys():
-                print(f"The provided business term ({bizterm}) does not exist!")
+        self.metrics.lookup('categorypath2biztermdict', category_path in self.metadata['categorypath2biztermdict'].keys())
+        if category_path not in self.metadata['categorypath2biztermdict'].keys():
+            if self.is_missing('categorypath2biztermdict', category_path):
                 return None
-            return self.metadata['categorypath2biztermdict'][category_path][bizterm]
+            if self.resolve('categorypath2biztermdict', category_path, partial(self.lookup_bizterms, category_path)) is None:
+                return None
+
+        bizterm_id = self.bizterm_index(category_path).lookup(bizterm)
+        # a missing business term is reported once per category path and negative_ttl
+        if bizterm_id is None and not self.is_missing('bizterm', (category_path, bizterm)):
+            self.missing.setdefault('bizterm', dict())[(category_path, bizterm)] = time.time()
+            suggestions = self.suggest_bizterms(bizterm, category_path)
+            self.print(f"The provided business term ({bizterm}) does not exist!"+(f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""))
+        return bizterm_id
 
+    def lookup_bizterms(self, category_path):
+        # all the business terms of a category path as a name -> id dict, None if the category does not exist
         category_id = self.get_category_id(category_path)
         if category_id is None:
             return None
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry, timeout=10))
-        headers = {
-            'Content-Type': "application/json",
-            'Authorization': "Bearer "+self.token,
-            'Cache-Control': "no-cache",
-            # 'Connection': "keep-alive"
-        }
+        self.print(f"searching business terms in {category_path}.. ")
+        bizterm2id = dict()
+        for row in self.search_bizterms([category_id]):
+            bizterm2id[row['metadata']['name']] = row['artifact_id']
+        self.metadata['categorypath2biztermdict'][category_path] = bizterm2id
+        self.metadata['categorypath2termcount'][category_path] = len(bizterm2id)
+        return bizterm2id
 
-        payload={
-            "size": 300, 
-            "from": 0, 
-            "_source": [
-                "artifact_id",
-                "metadata.artifact_type",
-                "metadata.name",
-                "metadata.description",
-                "categories",
-                "entity.artifacts"],
-            "query": {
-                "bool": {
-                    "filter": {
-                        "bool": {
-                            # "minimum_should_match":1,
-                            "should": [
-                                # {"match": {"metadata.name": bizterm}},
-                                {"term":{"categories.primary_category_id":category_id}}
-                            ],
-                            "must_not": {
-                                "terms": {
-                                    "metadata.artifact_type": ["category"]
-                                }
-                            }
-                        }
+    def suggest_bizterms(self, bizterm, category_path, limit=5):
+        # closest business terms of a category path, ranked locally from the loaded terms
+        if category_path not in self.metadata['categorypath2biztermdict'].keys():
+            return []
+        return self.bizterm_index(category_path).suggest(bizterm, limit)
+
+    def search_bizterms(self, category_ids=None, page_size=DEFAULT_PAGE_SIZE):
+        # yield every business term in the given categories (the whole glossary if None)
+        query_filter = []
+        if category_ids is not None:
+            query_filter.append({"terms": {"categories.primary_category_id": list(category_ids)}})
+        query = {
+            "bool": {
+                "filter": query_filter,
+                "must_not": {
+                    "terms": {
+                        "metadata.artifact_type": ["category"]
                     }
                 }
             }
         }
-        print(f"searching business terms in {category_path}.. ")
-        try:
-            r = s.post(
-                f"{self.cpd_cluster_host}/v3/search",
-                headers=headers,
-                json=payload,
-                verify=False
-            )
-        except requests.exceptions.RequestException as e:
-            self.logger.error(str(e))
-            raise SystemExit(e)
-        finally:
-            s.close()
-        df = json_normalize(json.loads(r.text)["rows"])
-        bizterm2id = dict(zip(df['metadata.name'], df['artifact_id']))
-        self.metadata['categorypath2biztermdict'][category_path] = bizterm2id
+        # only the fields the term indexes are built from
+        source = ["artifact_id", "metadata.name", "categories.primary_category_id"]
+        yield from self.search_artifacts(query, source, page_size, "term_search")
 
-        bizterm_id = None
-        if len(bizterm2id)>0:
-            for key, val in bizterm2id.items():
-                if key==bizterm:
-                    bizterm_id = val
-                    break
-        if bizterm_id is None:
-            print(f"The provided business term ({bizterm}) does not exist!")
-        return bizterm_id
+    def preload_bizterms(self, category_paths=None, page_size=DEFAULT_PAGE_SIZE):
+        # fill metadata['categorypath2biztermdict'] of all the given category paths with one paginated search,
+        # so that get_bizterm_id never goes to the network during the mapping.
+        if category_paths is None:
+            if self.category_index is None:
+                self.build_category_index(page_size)
+            category_paths = self.category_paths()
+        categoryid2paths = dict()
+        for category_path in set(category_paths):
+            if category_path in self.metadata['categorypath2biztermdict'].keys():
+                continue
+            category_id = self.get_category_id(category_path)
+            if category_id is None:
+                continue
+            categoryid2paths.setdefault(category_id, []).append(category_path)
+        if len(categoryid2paths)==0:
+            return
+        self.print(f"preloading business terms in {len(categoryid2paths)} categories.. ")
+        bizterm_dicts = {category_id: dict() for category_id in categoryid2paths.keys()}
+        count = 0
+        for row in self.search_bizterms(categoryid2paths.keys(), page_size):
+            category_id = row.get('categories', {}).get('primary_category_id')
+            if category_id in bizterm_dicts:
+                bizterm_dicts[category_id][row['metadata']['name']] = row['artifact_id']
+                count += 1
+        for category_id, category_paths in categoryid2paths.items():
+            for category_path in category_paths:
+                self.metadata['categorypath2biztermdict'][category_path] = bizterm_dicts[category_id]
+                self.metadata['categorypath2termcount'][category_path] = len(bizterm_dicts[category_id])
+        self.print(f"{count} business terms are preloaded.")
+
+    def preload(self, categories, catalog2assets):
+        # resolve the categories, business terms and asset ids of a mapping csv before any write
+        if self.category_index is None and not set(categories) <= set(self.metadata['category2id'].keys()):
+            self.build_category_index()
+        self.preload_bizterms(categories)
+        for catalog_name, asset_names in catalog2assets.items():
+            self.resolve_asset_ids(catalog_name, asset_names)
 
-        # if len(json.loads(r.text)["rows"])>0:
-        #     for row in json.loads(r.text)["rows"]:
-        #         if row['metadata']['name']==bizterm: 
-        #             bizterm_id = row["artifact_id"]
-        #             self.metadata['categorypath2biztermsdf'][category_path] = bizterm_id
-        #             break
-        # if bizterm_id is None:
-        #     print(f"The provided business term ({bizterm}) does not exist!")
-        # return bizterm_id
-        
     def update_attribute(self, asset_name, catalog_name,column_name, bizterm, category_path):
         catalog_id = self.get_catalog_id(catalog_name)
         asset_id = self.get_asset_id(asset_name, catalog_name)
         bizterm_id = self.get_bizterm_id(bizterm, category_path)
         if None in set([catalog_id, asset_id, bizterm_id]):
             return
+        bizterm = self.bizterm_display_name(bizterm, category_path)
         
-        s = requests.session()
-        retry = Retry(total=15,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry,timeout=15))
         headers = {
             'Content-Type': "application/json",
             'Authorization': "Bearer "+self.token
@@ -402,103 +1642,551 @@ class WatsonKnowledgeCatalog(metaclass=ABCMeta):
                 }
             }
         ]
-        print(f"updating column_info attribute of {column_name} of {asset_name} in {catalog_name} with {bizterm} in {category_path}.. ")
+        self.print(f"updating column_info attribute of {column_name} of {asset_name} in {catalog_name} with {bizterm} in {category_path}.. ")
         try: 
-            r=s.patch(
-                f"{self.cpd_cluster_host}/v2/assets/{asset_id}/attributes/column_info?catalog_id={catalog_id}",
+            r = self.request(
+                "PATCH",
+                f"/v2/assets/{asset_id}/attributes/column_info?catalog_id={catalog_id}",
                 json=payload,
-                headers=headers,
-                verify=False
+                headers=headers
             )
         except requests.exceptions.RequestException as e:
-            print('Fail to update attribute')
+            self.print('Fail to update attribute')
             self.logger.error(str(e))
             raise SystemExit(e)
-        finally:
-            s.close()
+        return r
     
-    def map_bizterm(self, map_bizterm_csv='map-bizterm-glossary.csv'):
-        df = pd.read_csv(map_bizterm_csv)
-        start = time.time()
+    def run_assets(self, task, groups, max_workers=1):
+        # run task(catalog_name, asset_name, rows) on each ((Catalog, DataAsset), rows) group with a bounded pool of workers.
+        # the task returns "ok" or "skipped" (or a dict with a "Status" and extra result columns),
+        # and any exception only fails its own asset.
+        import pandas as pd
+        def run(catalog_name, asset_name, rows):
+            start = time.time()
+            status, error, extra = None, None, dict()
+            try:
+                status = task(catalog_name, asset_name, rows)
+            except (Exception, SystemExit) as e:
+                status, error = "failed", str(e)
+                self.logger.error(f"{asset_name} of {catalog_name}: {e}")
+            if isinstance(status, dict):
+                extra = status
+                status = extra.pop("Status")
+            return {
+                "Catalog": catalog_name,
+                "DataAsset": asset_name,
+                "Columns": len(rows),
+                "Status": status,
+                "Latency": time.time()-start,
+                "Error": error,
+                **extra
+            }
+        # groups may be a generator: only a window of 2*max_workers groups is in flight at a time
+        results = []
+        futures = deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for (catalog_name, asset_name), rows in groups:
+                futures.append(executor.submit(run, catalog_name, asset_name, rows))
+                if len(futures)>=2*max_workers:
+                    results.append(futures.popleft().result())
+            while futures:
+                results.append(futures.popleft().result())
+        columns = ["Catalog", "DataAsset", "Columns", "Status", "Latency", "Error"]
+        for result in results:
+            columns += [column for column in result.keys() if column not in columns]
+        return pd.DataFrame(results, columns=columns)
 
-        df_attribute = df[['Catalog', 'DataAsset']].drop_duplicates(ignore_index=True)
-        print('='*100)
-        print(f"1. Creating attribute..")
-        for idx, row in df_attribute.iterrows():
-            print('-'*100)
-            print(f"{idx}-{row.DataAsset} of {row.Catalog}..")
-            self.create_attribute(row.DataAsset, row.Catalog)
-        print('='*100)            
-        print(f"2. Patching column info attribute into data asset in catalogs..")
-
-        for idx, row in df.iterrows():
-            print('-'*100)
-            print(f"{idx}-{row.BusinessTerm} is mapped to {row.ColumnHeader} in {row.DataAsset} of {row.Catalog}..")
-            self.update_attribute(row.DataAsset, row.Catalog, row.ColumnHeader, row.BusinessTerm, row.Category)
-        end = time.time()
-        elapsed_time = end-start
+    def print_result(self, result, elapsed_time):
         print('='*100)
-        print(f"it takes {elapsed_time} seconds / ({elapsed_time/len(df)} sec per column)")
+        print(f"it takes {elapsed_time} seconds / ({elapsed_time/max(result.Columns.sum(), 1)} sec per column, {elapsed_time/max(len(result), 1)} sec per asset)")
+        print(", ".join(f"{status}: {count}" for status, count in result.Status.value_counts().items()))
+        if len(result)>0:
+            print(f"latency per asset: p50 {result.Latency.quantile(0.5):.3f}s / max {result.Latency.max():.3f}s")
+        summary = self.metrics.summary()
+        print("requests: "+", ".join(f"{endpoint} {stats['requests']}" for endpoint, stats in summary["endpoints"].items()))
+        print("cache hit ratio: "+", ".join(f"{namespace} {stats['hit_ratio']:.2f}" for namespace, stats in summary["cache"].items()))
         print('='*100)
 
-    def map_bizterm_allatonce(self, map_bizterm_csv='map-bizterm-glossary.csv'):
-        
+    def print_diff(self, incremental):
+        # keep the per column diff of an incremental run in self.diff as a table
+        import pandas as pd
+        self.diff = pd.DataFrame(self.diff, columns=["Catalog", "DataAsset", "ColumnHeader", "Operation", "BusinessTerm", "TermId"])
+        if incremental:
+            print('='*100)
+            print("diff: "+", ".join(f"{operation}: {count}" for operation, count in self.diff.Operation.value_counts().items()))
+
+    def map_asset_by_column(self, catalog_name, asset_name, rows, batch_size=DEFAULT_BATCH_SIZE):
+        if self.get_asset_id(asset_name, catalog_name) is None:
+            return "skipped"
+        # columns already patched by an interrupted run (see resume) are not sent again
+        patched = self.patched_columns.get((catalog_name, asset_name), dict())
+        if len(patched)==0:
+            # an attribute left by an earlier run (409) is patched as well; any other failure fails the asset
+            r = self.create_attribute(asset_name, catalog_name)
+            if r.status_code!=409:
+                r.raise_for_status()
+        operations, path2column = [], dict()
+        for row in rows.itertuples():
+            self.print('-'*100)
+            self.print(f"{row.BusinessTerm} is mapped to {row.ColumnHeader} in {asset_name} of {catalog_name}..")
+            bizterm_id = self.get_bizterm_id(row.BusinessTerm, row.Category)
+            if bizterm_id is not None and patched.get(row.ColumnHeader)!=bizterm_id:
+                operations.append(column_terms_operation("add", row.ColumnHeader, self.bizterm_display_name(row.BusinessTerm, row.Category), bizterm_id))
+                path2column[operations[-1]['path']] = (row.ColumnHeader, bizterm_id)
+        on_patched = None
+        if self.journal is not None:
+            on_patched = lambda chunk: self.journal.record_columns(catalog_name, asset_name, dict(path2column[operation['path']] for operation in chunk))
+        self.patch_attribute_in_batches(asset_name, catalog_name, operations, batch_size, on_patched)
+        return "ok"
+
+    def map_asset_allatonce(self, catalog_name, asset_name, rows):
+        self.print('='*100)
+        self.print(f"Creating and patching attribute on {asset_name} of {catalog_name}..")
+        self.print('='*100)
+        catalog_id = self.get_catalog_id(catalog_name)
+        asset_id = self.get_asset_id(asset_name, catalog_name)
+        if None in set([catalog_id, asset_id]):
+            return "skipped"
         headers = {
             'Content-Type': "application/json",
             'Authorization': "Bearer "+self.token
         }
-        
-        df = pd.read_csv(map_bizterm_csv)
+        payload = dict()
+        payload['name'] = "column_info"
+        payload['entity'] = dict()
+        for row in rows.itertuples():
+            bizterm_id = self.get_bizterm_id(row.BusinessTerm, row.Category)
+            if bizterm_id is None:
+                continue
+            payload['entity'][row.ColumnHeader] = dict()
+            payload['entity'][row.ColumnHeader]['column_terms'] = [
+                {
+                    'term_display_name': self.bizterm_display_name(row.BusinessTerm, row.Category), 'term_id': bizterm_id
+                }
+            ]
+        try: 
+            r = self.request(
+                "POST",
+                f"/v2/assets/{asset_id}/attributes?catalog_id={catalog_id}",
+                json=payload,
+                headers=headers
+            )
+        except requests.exceptions.RequestException as e:
+            self.print('Fail to create attribute')
+            self.logger.error(str(e))
+            raise SystemExit(e)
+        r.raise_for_status()
+        return "ok"
+
+    def diff_attribute(self, column_info, column2term, remove_missing=False):
+        # compare the current column_info attribute with {column: (bizterm, bizterm_id)} of the csv.
+        # each column becomes an add, replace, remove (only with remove_missing) or no-op operation. a csv column
+        # whose term could not be resolved (bizterm_id None) is "unresolved": it is left as it is, never removed.
+        diff = []
+        for column_name, (bizterm, bizterm_id) in column2term.items():
+            if bizterm_id is None:
+                diff.append({"ColumnHeader": column_name, "Operation": "unresolved", "BusinessTerm": bizterm, "TermId": None})
+                continue
+            current_terms = [
+                (term.get('term_display_name'), term.get('term_id'))
+                for term in (column_info.get(column_name) or {}).get('column_terms', [])
+            ]
+            if len(current_terms)==0:
+                operation = "add"
+            elif current_terms==[(bizterm, bizterm_id)]:
+                operation = "no-op"
+            else:
+                operation = "replace"
+            diff.append({"ColumnHeader": column_name, "Operation": operation, "BusinessTerm": bizterm, "TermId": bizterm_id})
+        if remove_missing:
+            for column_name in column_info.keys():
+                if column_name not in column2term:
+                    diff.append({"ColumnHeader": column_name, "Operation": "remove", "BusinessTerm": None, "TermId": None})
+        return diff
+
+    def map_asset_incremental(self, catalog_name, asset_name, rows, remove_missing=False, batch_size=DEFAULT_BATCH_SIZE):
+        catalog_id = self.get_catalog_id(catalog_name)
+        asset_id = self.get_asset_id(asset_name, catalog_name)
+        if None in set([catalog_id, asset_id]):
+            return "skipped"
+        column2term = dict()
+        for row in rows.itertuples():
+            bizterm_id = self.get_bizterm_id(row.BusinessTerm, row.Category)
+            bizterm = row.BusinessTerm if bizterm_id is None else self.bizterm_display_name(row.BusinessTerm, row.Category)
+            column2term[row.ColumnHeader] = (bizterm, bizterm_id)
+        self.print(f"comparing column_info attribute of {asset_name} in {catalog_name}.. ")
+        column_info = self.get_attribute(asset_name, catalog_name)
+        if column_info is None:
+            self.create_attribute(asset_name, catalog_name).raise_for_status()
+            column_info = dict()
+        diff = self.diff_attribute(column_info, column2term, remove_missing)
+        operations = [
+            column_terms_operation(each['Operation'], each['ColumnHeader'], each['BusinessTerm'], each['TermId'])
+            for each in diff if each['Operation'] not in ("no-op", "unresolved")
+        ]
+        self.patch_attribute_in_batches(asset_name, catalog_name, operations, batch_size)
+        for each in diff:
+            self.diff.append({"Catalog": catalog_name, "DataAsset": asset_name, **each})
+        counts = {operation: sum(1 for each in diff if each['Operation']==operation) for operation in ("add", "replace", "remove", "no-op", "unresolved")}
+        return {"Status": "ok", "Added": counts["add"], "Replaced": counts["replace"], "Removed": counts["remove"], "Unchanged": counts["no-op"], "Unresolved": counts["unresolved"]}
+
+    def bulk_assets(self, assets=None, map_bizterm_csv=None, catalogs=None, chunksize=None):
+        # {catalog: [asset names]} of a list of (catalog, asset) pairs, of a mapping csv or of whole catalogs,
+        # with all the asset ids resolved up front by a few searches per catalog
+        if assets is not None:
+            catalog2assets = dict()
+            for catalog_name, asset_name in assets:
+                catalog2assets.setdefault(catalog_name, dict())[asset_name] = None
+        elif map_bizterm_csv is not None:
+            catalog2assets = self.plan_mapping(map_bizterm_csv, chunksize=chunksize).catalog2assets
+        else:
+            catalog2assets = {catalog_name: self.list_assets(catalog_name) for catalog_name in catalogs}
+        for catalog_name, asset_names in catalog2assets.items():
+            self.resolve_asset_ids(catalog_name, asset_names)
+        return {catalog_name: list(asset_names) for catalog_name, asset_names in catalog2assets.items()}
+
+    def run_bulk(self, task, title, catalog2assets, max_workers=4):
+        # run task(catalog_name, asset_name) on every asset with max_workers workers and return the result table
         start = time.time()
-        for idx,((catalog_name, asset_name), rows) in enumerate(df.groupby(['Catalog','DataAsset'])):
-            print('='*100)
-            print(f"{idx}-Creating and patching attribute on {asset_name} of {catalog_name}..")
-            print('='*100)
-            s = requests.session()
-            retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-            s.mount('https://',TimeoutHTTPAdapter(max_retries=retry))
-            catalog_id = self.get_catalog_id(catalog_name)
-            asset_id = self.get_asset_id(asset_name, catalog_name)
-            payload = dict()
-            payload['name'] = "column_info"
-            payload['entity'] = dict()
-            for idx, row in rows.iterrows():
-                payload['entity'][row.ColumnHeader]=dict()
-                bizterm_id = self.get_bizterm_id(row.BusinessTerm, row.Category)
-                payload['entity'][row.ColumnHeader]['column_terms'] = [
-                    {
-                        'term_display_name': row.BusinessTerm, 'term_id': bizterm_id
-                    }
-                ]            
-            try: 
-                r=s.post(
-                    f"{self.cpd_cluster_host}/v2/assets/{asset_id}/attributes?catalog_id={catalog_id}",
-                    json=payload,
-                    headers=headers,
-                    verify=False
-                )
-            except requests.exceptions.RequestException as e:
-                print('Fail to create attribute')
-                self.logger.error(str(e))
-                raise SystemExit(e)
-            finally:
-                s.close()
-        end = time.time()
-        elapsed_time = end - start
         print('='*100)
-        print(f"it takes {elapsed_time} seconds / ({elapsed_time/len(df)} sec per asset)")
+        print(f"{title} with {max_workers} worker(s)..")
+        def run(catalog_name, asset_name, rows):
+            if self.get_asset_id(asset_name, catalog_name) is None:
+                return {"Status": "skipped", "Columns": 0}
+            return task(catalog_name, asset_name)
+        groups = (((catalog_name, asset_name), ()) for catalog_name, asset_names in catalog2assets.items() for asset_name in asset_names)
+        result = self.run_assets(run, groups, max_workers)
+        self.save_cache()
+        self.print_result(result, time.time()-start)
+        self.export_metrics()
+        return result
+
+    def attribute_status(self, r):
+        # status of an attribute call in a bulk result table: ok, missing (404) or exists (409)
+        if r.status_code==404:
+            return "missing"
+        if r.status_code==409:
+            return "exists"
+        r.raise_for_status()
+        return "ok"
+
+    def bulk_create_attribute(self, assets=None, map_bizterm_csv=None, catalogs=None, max_workers=4):
+        # create an empty column_info attribute in every asset (assets: list of (catalog name, asset name))
+        def create(catalog_name, asset_name):
+            return {"Status": self.attribute_status(self.create_attribute(asset_name, catalog_name)), "Columns": 0}
+        return self.run_bulk(create, "Creating column info attribute", self.bulk_assets(assets, map_bizterm_csv, catalogs), max_workers)
+
+    def bulk_delete_attribute(self, assets=None, map_bizterm_csv=None, catalogs=None, max_workers=4):
+        def delete(catalog_name, asset_name):
+            return {"Status": self.attribute_status(self.delete_attribute(asset_name, catalog_name)), "Columns": 0}
+        return self.run_bulk(delete, "Deleting column info attribute", self.bulk_assets(assets, map_bizterm_csv, catalogs), max_workers)
+
+    def bulk_reset_attribute(self, assets=None, map_bizterm_csv=None, catalogs=None, max_workers=4):
+        # delete the column_info attribute of every asset and create it again empty
+        def reset(catalog_name, asset_name):
+            self.attribute_status(self.delete_attribute(asset_name, catalog_name))
+            return {"Status": self.attribute_status(self.create_attribute(asset_name, catalog_name)), "Columns": 0}
+        return self.run_bulk(reset, "Resetting column info attribute", self.bulk_assets(assets, map_bizterm_csv, catalogs), max_workers)
+
+    def bulk_view_attribute(self, assets=None, map_bizterm_csv=None, catalogs=None, max_workers=4):
+        # columns and business terms in the column_info attribute of every asset (see export_column_info for the terms)
+        def view(catalog_name, asset_name):
+            column_info = self.get_attribute(asset_name, catalog_name)
+            if column_info is None:
+                return {"Status": "missing", "Columns": 0, "Terms": 0}
+            terms = sum(len((info or {}).get('column_terms') or []) for info in column_info.values())
+            return {"Status": "ok", "Columns": len(column_info), "Terms": terms}
+        return self.run_bulk(view, "Reading column info attribute", self.bulk_assets(assets, map_bizterm_csv, catalogs), max_workers)
+
+    def snapshot_attributes(self, snapshot='column-info-snapshot.jsonl', assets=None, map_bizterm_csv=None, catalogs=None, max_workers=4):
+        # save the column_info attribute of every asset into a local json lines file, to be restored later
+        lock = threading.Lock()
+        with open(snapshot, 'w', encoding='utf-8') as f:
+            def save(catalog_name, asset_name):
+                column_info = self.get_attribute(asset_name, catalog_name)
+                if column_info is None:
+                    return {"Status": "missing", "Columns": 0}
+                line = json.dumps({"catalog": catalog_name, "asset": asset_name, "asset_id": self.get_asset_id(asset_name, catalog_name), "column_info": column_info}, ensure_ascii=False)
+                with lock:
+                    f.write(line+"\n")
+                return {"Status": "ok", "Columns": len(column_info)}
+            return self.run_bulk(save, f"Saving column info attribute into {snapshot}", self.bulk_assets(assets, map_bizterm_csv, catalogs), max_workers)
+
+    def restore_attributes(self, snapshot='column-info-snapshot.jsonl', max_workers=4):
+        # put back the column_info attributes of a snapshot: each one replaces the current attribute of the asset
+        # with the same name in the same catalog
+        column_infos = dict()
+        with open(snapshot, encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                column_infos[(record["catalog"], record["asset"])] = record["column_info"]
+        def restore(catalog_name, asset_name):
+            column_info = column_infos[(catalog_name, asset_name)]
+            self.attribute_status(self.delete_attribute(asset_name, catalog_name))
+            return {"Status": self.attribute_status(self.create_attribute(asset_name, catalog_name, column_info)), "Columns": len(column_info)}
+        return self.run_bulk(restore, f"Restoring column info attribute from {snapshot}", self.bulk_assets(list(column_infos)), max_workers)
+
+    def column_info_rows(self, catalog_name, asset_name, termid2category=None):
+        # flat rows (EXPORT_COLUMNS) of the column_info attribute of an asset, one per column and business term.
+        # a column without any term is kept with an empty BusinessTerm.
+        column_info = self.get_attribute(asset_name, catalog_name)
+        if column_info is None:
+            return None
+        termid2category = termid2category or {}
+        catalog_id = self.get_catalog_id(catalog_name)
+        asset_id = self.get_asset_id(asset_name, catalog_name)
+        rows = []
+        for column_name, info in column_info.items():
+            terms = (info or {}).get('column_terms') or [{}]
+            for term in terms:
+                rows.append({
+                    "Catalog": catalog_name,
+                    "DataAsset": asset_name,
+                    "ColumnHeader": column_name,
+                    "BusinessTerm": term.get('term_display_name'),
+                    "Category": termid2category.get(term.get('term_id')),
+                    "CatalogId": catalog_id,
+                    "AssetId": asset_id,
+                    "TermId": term.get('term_id'),
+                })
+        return rows
+
+    def export_column_info(self, output='column-info.csv', map_bizterm_csv=None, catalogs=None, max_workers=1, preload=True, chunksize=None):
+        # fetch the column_info attribute of the assets of a mapping csv (or of every asset of the given catalogs)
+        # with max_workers workers, and stream the term assignments into one csv or parquet file with the columns
+        # of the mapping csv plus the ids. the category of a term is filled from the preloaded business terms.
+        start = time.time()
+        if map_bizterm_csv is not None:
+            _, catalog2assets, _ = self.load_mapping(map_bizterm_csv, chunksize)
+        else:
+            catalog2assets = {catalog_name: self.list_assets(catalog_name) for catalog_name in catalogs}
+        if preload:
+            self.preload_bizterms()
+            for catalog_name, asset_names in catalog2assets.items():
+                self.resolve_asset_ids(catalog_name, asset_names)
+        termid2category = {
+            bizterm_id: category_path
+            for category_path, bizterm2id in self.metadata['categorypath2biztermdict'].items()
+            for bizterm_id in bizterm2id.values()
+        }
+        writer = TableWriter(output, EXPORT_COLUMNS)
+        def export(catalog_name, asset_name, rows):
+            rows = self.column_info_rows(catalog_name, asset_name, termid2category)
+            if rows is None:
+                return {"Status": "skipped", "Columns": 0}
+            writer.write(rows)
+            return {"Status": "ok", "Columns": len(rows)}
+        print('='*100)
+        print(f"Exporting column info attribute of data assets into {output} with {max_workers} worker(s)..")
+        groups = (((catalog_name, asset_name), ()) for catalog_name, asset_names in catalog2assets.items() for asset_name in asset_names)
+        try:
+            result = self.run_assets(export, groups, max_workers)
+        finally:
+            writer.close()
+        self.save_cache()
+        self.print_result(result, time.time()-start)
+        self.export_metrics()
+        return result
+
+    def load_mapping(self, map_bizterm_csv, chunksize=None, presorted=False):
+        # returns the categories, the asset names per catalog and the (Catalog, DataAsset) groups of a mapping csv
+        plan = self.plan_mapping(map_bizterm_csv, chunksize=chunksize)
+        return plan.categories, plan.catalog2assets, self.mapping_groups(map_bizterm_csv, chunksize, presorted)
+
+    def mapping_groups(self, map_bizterm_csv, chunksize=None, presorted=False):
+        # the (Catalog, DataAsset) groups of a mapping csv. with chunksize the csv is never held in memory as a whole:
+        # the groups are streamed chunk by chunk, either straight from a csv sorted by (Catalog, DataAsset)
+        # or through hash partitions on disk.
+        if chunksize is None:
+            return drop_blank_keys(read_mapping_csv(map_bizterm_csv, None)).groupby(['Catalog','DataAsset'], sort=False)
+        if presorted:
+            return stream_sorted_groups(map_bizterm_csv, chunksize)
+        return stream_partitioned_groups(map_bizterm_csv, chunksize)
+
+    def plan_mapping(self, map_bizterm_csv='map-bizterm-glossary.csv', mode='map_bizterm', max_workers=1, incremental=False, batch_size=DEFAULT_BATCH_SIZE, chunksize=None, latencies=None, page_size=DEFAULT_PAGE_SIZE):
+        # validate a mapping csv and compile it into a MappingPlan without any api call. the requests are estimated
+        # from what is already resolved in the metadata, and the runtime from the latencies recorded in self.metrics,
+        # in latencies ({endpoint: seconds} or the file of a JSONMetricsExporter) or from DEFAULT_PLAN_LATENCY.
+        import pandas as pd
+        missing = [column for column in MAPPING_COLUMNS if column not in pd.read_csv(map_bizterm_csv, nrows=0).columns]
+        if len(missing)>0:
+            raise ValueError(f"{map_bizterm_csv} has no {', '.join(missing)} column(s)")
+        plan = MappingPlan(map_bizterm_csv)
+        # duplicated columns are found per asset group: in a whole chunk, plus the columns of the asset the previous
+        # chunk ended with, so that memory stays bounded in chunked mode. in an unsorted csv read in chunks,
+        # repeated rows of an asset that fall into chunks far apart are not detected.
+        empty, duplicated, previous = 0, 0, None
+        chunks = [read_mapping_csv(map_bizterm_csv, None)] if chunksize is None else read_mapping_csv(map_bizterm_csv, chunksize)
+        for chunk in chunks:
+            plan.rows += len(chunk)
+            blank = chunk[MAPPING_COLUMNS].isna().any(axis=1)
+            empty += int(blank.sum())
+            chunk = chunk[~blank]
+            plan.categories.update(chunk.Category.unique())
+            plan.bizterms.update(zip(chunk.Category, chunk.BusinessTerm))
+            for (catalog_name, asset_name), columns in chunk.groupby(['Catalog', 'DataAsset']).size().items():
+                assets = plan.catalog2assets.setdefault(catalog_name, dict())
+                assets[asset_name] = assets.get(asset_name, 0)+int(columns)
+            keys = chunk[['Catalog', 'DataAsset', 'ColumnHeader']]
+            if previous is not None:
+                keys = pd.concat([previous, keys])
+            if len(keys)==0:
+                continue
+            duplicated += int(keys.duplicated().sum())
+            last = keys.iloc[-1]
+            previous = keys[(keys.Catalog==last.Catalog) & (keys.DataAsset==last.DataAsset)].drop_duplicates()
+        if empty>0:
+            plan.issues.append(f"{empty} rows have an empty Catalog, DataAsset, ColumnHeader, BusinessTerm or Category")
+        if duplicated>0:
+            plan.issues.append(f"{duplicated} rows map a column already mapped by an earlier row")
+        unknown = [
+            bizterm for category_path, bizterm in plan.bizterms
+            if category_path in self.metadata['categorypath2biztermdict'] and self.bizterm_index(category_path).lookup(bizterm) is None
+        ]
+        if len(unknown)>0:
+            plan.issues.append(f"{len(unknown)} business terms do not exist in their category (ex. {', '.join(map(str, unknown[:5]))})")
+
+        # resolution stage: one lookup per unique name that is not resolved yet
+        metadata = self.metadata
+        asset_search = sum(
+            math.ceil(sum(1 for asset_name in assets if f"{catalog_name} >> {asset_name}" not in metadata['asset2id'])/DEFAULT_ASSET_CHUNK_SIZE)
+            for catalog_name, assets in plan.catalog2assets.items()
+        )
+        # the terms are preloaded with one search paging through every term of the uncached categories: its pages
+        # are counted from the term counts of a previous run, else from the terms of the csv (a lower bound).
+        # the category index pages through every category of the glossary, whose number is not known beforehand.
+        uncached = [category_path for category_path in plan.categories if category_path not in metadata['categorypath2biztermdict']]
+        uncounted = set(category_path for category_path in uncached if category_path not in metadata['categorypath2termcount'])
+        terms = sum(metadata['categorypath2termcount'].get(category_path, 0) for category_path in uncached)
+        terms += sum(1 for category_path, _ in plan.bizterms if category_path in uncounted)
+        plan.requests = {
+            "catalog_lookup": int(any(catalog_name not in metadata['catalog2id'] for catalog_name in plan.catalog2assets)),
+            "category_search": int(self.category_index is None and any(category_path not in metadata['category2id'] for category_path in uncached)),
+            "term_search": max(1, math.ceil(terms/page_size)) if uncached else 0,
+            "asset_search": asset_search,
+        }
+        if plan.requests["category_search"]>0:
+            plan.lower_bounds.add("category_search")
+        if len(uncounted)>0:
+            plan.lower_bounds.add("term_search")
+        # write stage: the batches of each asset
+        columns = [count for assets in plan.catalog2assets.values() for count in assets.values()]
+        if incremental:
+            plan.requests["attribute_read"] = len(columns)
+            plan.requests["attribute_write"] = sum(math.ceil(count/batch_size) for count in columns)
+        elif mode=="map_bizterm_allatonce":
+            plan.requests["attribute_write"] = len(columns)
+        else:
+            plan.requests["attribute_write"] = sum(1+math.ceil(count/batch_size) for count in columns)
+
+        if isinstance(latencies, str):
+            with open(latencies) as f:
+                latencies = {endpoint: stats["latency_avg"] for endpoint, stats in json.load(f)["endpoints"].items()}
+        latencies = {
+            **DEFAULT_PLAN_LATENCY,
+            **{endpoint: stats["latency_avg"] for endpoint, stats in self.metrics.summary()["endpoints"].items()},
+            **(latencies or {}),
+        }
+        plan.seconds = {
+            endpoint: count*latencies.get(endpoint, 0.0)/(max_workers if endpoint.startswith("attribute") else 1)
+            for endpoint, count in plan.requests.items()
+        }
+        return plan
+
+    def resume_from(self, journal):
+        # replay a checkpoint journal: the ids of the finished assets go back into the metadata and
+        # the columns patched so far are kept in self.patched_columns. returns the finished assets.
+        # only the assets journaled as "ok" are finished: skipped or failed ones are tried again.
+        assets, self.patched_columns = journal.replay()
+        finished = {key: record for key, record in assets.items() if record["status"]=="ok"}
+        for (catalog_name, asset_name), record in finished.items():
+            if record["catalog_id"] is not None:
+                self.metadata['catalog2id'].setdefault(catalog_name, record["catalog_id"])
+            if record["asset_id"] is not None:
+                self.metadata['asset2id'].setdefault(f"{catalog_name} >> {asset_name}", record["asset_id"])
+        print(f"{len(finished)} assets and {sum(len(columns) for columns in self.patched_columns.values())} columns are already done according to {journal.path}.")
+        return finished
+
+    def journaled(self, task, finished):
+        # wrap a mapping task so that every finished asset is journaled, and the assets finished by a previous run
+        # with the same rows are reported as "resumed" without any api call
+        def run(catalog_name, asset_name, rows):
+            digest = rows_digest(rows)
+            record = finished.get((catalog_name, asset_name))
+            if record is not None and record["status"]=="ok" and record["digest"]==digest:
+                return "resumed"
+            status = task(catalog_name, asset_name, rows)
+            self.journal.record_asset(
+                catalog_name, asset_name, digest, status["Status"] if isinstance(status, dict) else status,
+                self.metadata['catalog2id'].get(catalog_name), self.metadata['asset2id'].get(f"{catalog_name} >> {asset_name}")
+            )
+            return status
+        return run
+
+    def run_mapping(self, map_bizterm_csv, task, max_workers=1, preload=True, incremental=False, chunksize=None, presorted=False, journal=None, resume=False, mode='map_bizterm', batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+        # the csv is compiled into a plan first: the lookups are done once per unique name, then the writes per asset
+        start = time.time()
+        plan = self.plan_mapping(map_bizterm_csv, mode, max_workers, incremental, batch_size, chunksize)
+        plan.print()
+        if dry_run:
+            return plan
+        categories, catalog2assets = plan.categories, plan.catalog2assets
+        groups = self.mapping_groups(map_bizterm_csv, chunksize, presorted)
+        self.journal = CheckpointJournal(journal) if isinstance(journal, str) else journal
+        try:
+            if self.journal is not None:
+                finished = dict()
+                if resume:
+                    finished = self.resume_from(self.journal)
+                    # the finished assets need no lookup at all
+                    catalog2assets = {
+                        catalog_name: [asset_name for asset_name in asset_names if (catalog_name, asset_name) not in finished]
+                        for catalog_name, asset_names in catalog2assets.items()
+                    }
+                else:
+                    self.journal.clear()
+                task = self.journaled(task, finished)
+            if preload:
+                self.preload(categories, catalog2assets)
+            print('='*100)
+            print(f"Creating and patching column info attribute into data asset in catalogs with {max_workers} worker(s)..")
+            self.diff = []
+            result = self.run_assets(task, groups, max_workers)
+        finally:
+            if self.journal is not None:
+                self.journal.close()
+            self.journal = None
+            self.patched_columns = dict()
+        self.print_diff(incremental)
+        self.save_cache()
+        self.print_result(result, time.time()-start)
+        self.export_metrics()
+        return result
+
+    def map_bizterm(self, map_bizterm_csv='map-bizterm-glossary.csv', max_workers=1, preload=True, incremental=False, remove_missing=False, batch_size=DEFAULT_BATCH_SIZE, chunksize=None, presorted=False, journal=None, resume=False, dry_run=False):
+        if incremental:
+            task = partial(self.map_asset_incremental, remove_missing=remove_missing, batch_size=batch_size)
+        else:
+            task = partial(self.map_asset_by_column, batch_size=batch_size)
+        return self.run_mapping(map_bizterm_csv, task, max_workers, preload, incremental, chunksize, presorted, journal, resume, "map_bizterm", batch_size, dry_run)
+
+    def map_bizterm_allatonce(self, map_bizterm_csv='map-bizterm-glossary.csv', max_workers=1, preload=True, incremental=False, remove_missing=False, batch_size=DEFAULT_BATCH_SIZE, chunksize=None, presorted=False, journal=None, resume=False, dry_run=False):
+        if incremental:
+            task = partial(self.map_asset_incremental, remove_missing=remove_missing, batch_size=batch_size)
+        else:
+            task = self.map_asset_allatonce
+        return self.run_mapping(map_bizterm_csv, task, max_workers, preload, incremental, chunksize, presorted, journal, resume, "map_bizterm_allatonce", batch_size, dry_run)
         
 
 class MapTermsJSON(WatsonKnowledgeCatalog):
-    def __init__(self, cpd_cluster_host, info_json):
-        super().__init__(cpd_cluster_host)
-        self.token = self.get_token(info_json)
+    def __init__(self, cpd_cluster_host, info_json, **kwargs):
+        super().__init__(cpd_cluster_host, **kwargs)
+        with open(info_json) as f:
+            username = json.load(f)["username"]
+        self.authorize(partial(self.get_token, info_json), username)
     
                 
     def get_token(self, info_json):
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry))
         info = json.load(open(info_json))
         headers = {
             'cache-control': 'no-cache',
@@ -507,31 +2195,29 @@ class MapTermsJSON(WatsonKnowledgeCatalog):
 
         payload = json.dumps({"username":info["username"], "password":info["password"]})
         try:
-            r = s.post(f'{self.cpd_cluster_host}/icp4d-api/v1/authorize', headers=headers, data=payload, verify=False)
-            token=json.loads(r.text)['token']
+            r = self.request("POST", '/icp4d-api/v1/authorize', headers=headers, data=payload)
+            token=json.loads(r.content)['token']
         except requests.exceptions.RequestException as e:  # This is the correct syntax
-            raise SystemExit(e)
-        finally:
             self.logger.error(str(e))
-            s.close()
+            raise SystemExit(e)
         return token
     
         
 class MapTermsInput(WatsonKnowledgeCatalog):
-    def __init__(self, cpd_cluster_host,logger=logger):
-        super().__init__(cpd_cluster_host,logger)
-        self.token = self.get_token()
-    def get_token(self):
-        def user_input():
-            from getpass import getpass
-            username = input("1) Please enter your ID:")
-            password = getpass("2) Password: ")
-            return username, password
-        username, password = user_input()
+    def __init__(self, cpd_cluster_host,logger=logger, **kwargs):
+        super().__init__(cpd_cluster_host,logger, **kwargs)
+        # the credentials are asked once, and kept to refresh the token
+        username, password = self.user_input()
+        self.authorize(partial(self.get_token, username, password), username)
+    def user_input(self):
+        from getpass import getpass
+        username = input("1) Please enter your ID:")
+        password = getpass("2) Password: ")
+        return username, password
+    def get_token(self, username=None, password=None):
+        if username is None:
+            username, password = self.user_input()
 
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry))
         headers = {
             'cache-control': 'no-cache',
             'content-type': 'application/json'
@@ -539,24 +2225,19 @@ class MapTermsInput(WatsonKnowledgeCatalog):
 
         payload = json.dumps({"username":username, "password":password})
         try:
-            r = s.post(f'{self.cpd_cluster_host}/icp4d-api/v1/authorize', headers=headers, data=payload, verify=False)
-            token=json.loads(r.text)['token']
+            r = self.request("POST", '/icp4d-api/v1/authorize', headers=headers, data=payload)
+            token=json.loads(r.content)['token']
         except requests.exceptions.RequestException as e:
             self.logger.error(str(e))
             raise SystemExit(e)
-        finally:
-            s.close()
         return token
     
 
 class MapTermsJob(WatsonKnowledgeCatalog):
-    def __init__(self, cpd_cluster_host, username, password, filename, logger=logger):
-        super().__init__(cpd_cluster_host,logger)
-        self.token = self.get_token(username, pasword)
+    def __init__(self, cpd_cluster_host, username, password, filename, logger=logger, **kwargs):
+        super().__init__(cpd_cluster_host,logger, **kwargs)
+        self.authorize(partial(self.get_token, username, password), username)
     def get_token(self, username, password):
-        s = requests.session()
-        retry = Retry(total=10,backoff_factor=0.5,status_forcelist=[500,504])
-        s.mount('https://',TimeoutHTTPAdapter(max_retries=retry))
         headers = {
             'cache-control': 'no-cache',
             'content-type': 'application/json'
@@ -564,11 +2245,75 @@ class MapTermsJob(WatsonKnowledgeCatalog):
 
         payload = json.dumps({"username":username, "password":password})
         try:
-            r = s.post(f'{self.cpd_cluster_host}/icp4d-api/v1/authorize', headers=headers, data=payload, verify=False)
-            token=json.loads(r.text)['token']
+            r = self.request("POST", '/icp4d-api/v1/authorize', headers=headers, data=payload)
+            token=json.loads(r.content)['token']
         except requests.exceptions.RequestException as e:
             self.logger.error(str(e))
             raise SystemExit(e)
-        finally:
-            s.close()
-        return token
\ No newline at end of file
+        return token
+
+
+def shard_mapping_csv(map_bizterm_csv, shards, output_dir='shards', by='asset', chunksize=DEFAULT_CHUNKSIZE):
+    # split a mapping csv into shard files by catalog or by (Catalog, DataAsset), streaming it chunk by chunk.
+    # the split is deterministic, so independent jobs on separate nodes can each compute and take their own shard.
+    import pandas as pd
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, f"shard-{idx}-of-{shards}.csv") for idx in range(shards)]
+    for path in paths:
+        pd.DataFrame(columns=MAPPING_COLUMNS).to_csv(path, index=False)
+    for chunk in map(drop_blank_keys, read_mapping_csv(map_bizterm_csv, chunksize)):
+        for idx, rows in chunk.groupby(shard_of(chunk, shards, by)):
+            rows.to_csv(paths[idx], mode='a', header=False, index=False)
+    return paths
+
+
+def shard_options(options, shard_index, shards):
+    # the shards run in parallel, so a journal path becomes one file per shard (ex. journal-0-of-4.jsonl)
+    journal = options.get('journal')
+    if journal is None or shards==1:
+        return options
+    if not isinstance(journal, str):
+        raise ValueError("a sharded run takes a journal path, to write one journal file per shard")
+    root, ext = os.path.splitext(journal)
+    return {**options, 'journal': f"{root}-{shard_index}-of-{shards}{ext}"}
+
+
+def map_shard(client_class, client_kwargs, map_bizterm_csv, result_csv, mode='map_bizterm', shard_index=None, shards=1, by='asset', **options):
+    # run one shard with its own client and write its result table to result_csv.
+    # with shard_index, only the rows of that shard of the full csv are mapped (for jobs on separate nodes).
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if shard_index is not None:
+            map_bizterm_csv = shard_mapping_csv(map_bizterm_csv, shards, tmpdir, by)[shard_index]
+            options = shard_options(options, shard_index, shards)
+        with client_class(**client_kwargs) as wkc:
+            result = getattr(wkc, mode)(map_bizterm_csv, **options)
+    result.to_csv(result_csv, index=False)
+    return result_csv
+
+
+def merge_shard_results(result_csvs, output_csv=None):
+    # combine the result files of the shards into one report
+    import pandas as pd
+    result = pd.concat([pd.read_csv(result_csv) for result_csv in result_csvs], ignore_index=True)
+    if output_csv is not None:
+        result.to_csv(output_csv, index=False)
+    print('='*100)
+    print(f"{len(result_csvs)} shards, {len(result)} assets, {result.Columns.sum()} columns")
+    print(", ".join(f"{status}: {count}" for status, count in result.Status.value_counts().items()))
+    print('='*100)
+    return result
+
+
+def map_bizterm_sharded(client_class, client_kwargs, map_bizterm_csv='map-bizterm-glossary.csv', shards=4, processes=None, by='asset', output_dir='shards', mode='map_bizterm', **options):
+    # partition the mapping csv and run every shard in its own process with its own client (ex. MapTermsJob or
+    # MapTermsJSON; client_kwargs must be picklable), then merge the shard results into output_dir/result.csv
+    shard_csvs = shard_mapping_csv(map_bizterm_csv, shards, output_dir, by)
+    result_csvs = [os.path.join(output_dir, f"result-{idx}-of-{shards}.csv") for idx in range(shards)]
+    with ProcessPoolExecutor(max_workers=processes or shards) as executor:
+        futures = [
+            executor.submit(map_shard, client_class, client_kwargs, shard_csv, result_csv, mode, **shard_options(options, idx, shards))
+            for idx, (shard_csv, result_csv) in enumerate(zip(shard_csvs, result_csvs))
+        ]
+        for future in futures:
+            future.result()
+    return merge_shard_results(result_csvs, os.path.join(output_dir, "result.csv"))